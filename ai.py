@@ -1,109 +1,432 @@
-from functools import lru_cache
+import random
+import threading
+import time
 from random import sample
 from typing import Tuple
 
-from core_algorithm.algorithms import evaluate_point
-
-from board import ChessBoard
+from board import ChessBoard, profile_standards
+from book import OpeningBook
 from constants import *
+from ordering import MoveOrdering
+from stats import SearchStats
+from threat import ThreatSolver
+from transposition import EXACT, LOWER, UPPER, TranspositionTable
+
+# Transposition table shared by all searches, so that work is reused between moves of a game
+TABLE = TranspositionTable()
+# Move ordering learned by all searches, kept between moves of a game like TABLE
+ORDERING = MoveOrdering()
+
+# Opening book of the ai, None if no book has been built
+BOOK = OpeningBook.load()
+
+# Threat space solver tried before the full search, its cache is also kept between moves
+SOLVER = ThreatSolver()
+
+# Scores are seen by the player to move, so it is mixed into the key of a position. SIDE_KEYS[player]
+_random = random.Random(ZOBRIST_SEED + 1)
+SIDE_KEYS = [None, _random.getrandbits(64), _random.getrandbits(64)]
+
+INFINITY = 9999999999
+
+
+class NullBar:
+    """
+    Control bar which shows nothing, for searches without GUI
+    """
+
+    def step_in(self):
+        pass
+
+    def exit(self):
+        pass
 
 
-def min_max_search(board: ChessBoard, ai_num: int, control_bar, depth: int = 6):
+class SearchTimeout(Exception):
     """
-    Min-max search to find the best place of setting chess
+    Raised inside the search when its time budget is used up
+    """
+
+
+class SearchContext:
+    """
+    State shared by all the nodes of one search
+    """
+
+    def __init__(
+            self,
+            table: TranspositionTable,
+            deadline: float = None,
+            stop: threading.Event = None,
+            ordering: MoveOrdering = None,
+            stats: SearchStats = None,
+            shared_beta=None,
+            shared_depth: int = None,
+    ):
+        """
+        :param table: transposition table of the search
+        :param deadline: time.time() after which the search is stopped by SearchTimeout, None for no limit
+        :param stop: event which stops the search by SearchTimeout once set, None if it can not be cancelled
+        :param ordering: history and killer moves of the search, the shared ORDERING by default
+        :param stats: statistics to collect, None to collect nothing
+        :param shared_beta: function giving a beta which may have been lowered by another search since this one
+        started, read before every move of the node searched with depth shared_depth. None to keep the beta given.
+        :param shared_depth: depth of the top node of the search, the only node with this depth
+        """
+        self.table = table
+        self.ordering = ORDERING if ordering is None else ordering
+        self.deadline = deadline
+        self.stop = stop
+        self.stats = stats
+        self.shared_beta = shared_beta
+        self.shared_depth = shared_depth
+        self.nodes = 0
+
+    def stopped(self) -> bool:
+        """
+        :return: whether the search is cancelled or out of time
+        """
+        if self.stop is not None and self.stop.is_set():
+            return True
+        return self.deadline is not None and time.time() > self.deadline
+
+
+def min_max_search(
+        board: ChessBoard,
+        ai_num: int,
+        control_bar,
+        depth: int = 6,
+        table: TranspositionTable = None,
+        time_limit: float = None,
+        stop: threading.Event = None,
+        ordering: MoveOrdering = None,
+        use_book: bool = True,
+        use_threats: bool = THREAT_SEARCH,
+        info: dict = None,
+        stats: SearchStats = None,
+        pool=None,
+):
+    """
+    Search the best place of setting chess by iterative deepening up to depth.
+    Every iteration is a principal variation search in an aspiration window around the score of the last one.
     :param control_bar: class Bar from main.py
     :param ai_num: The player number which ai is
     :param board: chessboard
     :param depth: depth of calculation NOTE: GREAT NUMBER OF DEPTH MAY SPEND A LONG TIME
-    :return: the coordinate of best position
+    :param table: transposition table to use, the shared TABLE by default
+    :param time_limit: seconds allowed for the search. If given, return the best position of the deepest iteration
+    finished in time
+    :param stop: event to cancel the search from another thread
+    :param ordering: history and killer moves to use and learn, the shared ORDERING by default
+    :param use_book: whether to play the position of the opening book when there is one
+    :param use_threats: whether to look for a forced win by threats before the full search
+    :param info: dict updated after every finished iteration with its "depth", "score" for the ai,
+    "nodes" searched so far and "pv", the principal variation starting with the best position
+    :param stats: statistics to collect during the full search, None to collect nothing
+    :param pool: ParallelSearch of parallel.py whose workers search the positions of the root of every iteration,
+    None to search them in this process. Its workers have their own transposition tables, so the principal
+    variation in info only has the best position then
+    :return: the coordinate of best position, None if the search is cancelled before finding one
     """
+    if table is None:
+        table = TABLE
+    table.new_search()
+
     # If the board is empty
-    for x in board.board:
-        for y in x:
-            if y != 0:
-                break
-        else:
-            continue
-        break
-    else:
+    if board.is_empty():
         control_bar.exit()
         return 7, 7
 
-    max_v = -99999999
+    if use_book and BOOK is not None:
+        position = BOOK.lookup(board)
+        if position is not None:
+            control_bar.exit()
+            return position
+
+    deadline = None if time_limit is None else time.time() + time_limit
+
+    # A forced win by threats is found much faster than by the full search
+    if use_threats:
+        sequence = SOLVER.solve(
+            board,
+            ai_num,
+            None if time_limit is None else time.time() + time_limit * THREAT_TIME_SHARE,
+            stop,
+        )
+        if sequence:
+            control_bar.exit()
+            return sequence[0]
+        if stop is not None and stop.is_set():
+            control_bar.exit()
+            return None
+
     points = points_gen(board, ai_num)
+    context = SearchContext(table, stop=stop, ordering=ordering, stats=stats)
+    context.ordering.new_search()
+    candidates = []
+    score = None
+    root = search_root if pool is None else pool.search_root
+    if stats is not None:
+        stats.start()
+    for current_depth in range(depth + 1):
+        try:
+            candidates, scores, score = root(
+                board, ai_num, points, current_depth, context, control_bar, score
+            )
+        except SearchTimeout:
+            break
+        if stats is not None:
+            stats.iteration(current_depth, context.nodes, score)
+        # Search the best positions of this iteration first in the next one
+        points.sort(key=lambda point: scores[point], reverse=True)
+        if info is not None:
+            info.update(
+                depth=current_depth,
+                score=score,
+                nodes=context.nodes,
+                pv=principal_variation(board, ai_num, candidates[0], table),
+            )
+        # The first iteration always finishes unless cancelled, so that there is a result
+        context.deadline = deadline
+    if stats is not None:
+        stats.finish(context.nodes)
+    control_bar.exit()
+    if not candidates or (stop is not None and stop.is_set()):
+        return None
+    position = sample(candidates, 1)[0]
+    if info is not None:
+        info["pv"] = principal_variation(board, ai_num, position, table)
+    return position
+
+
+def search_root(
+        board: ChessBoard,
+        ai_num: int,
+        points: list,
+        depth: int,
+        context: SearchContext,
+        control_bar,
+        guess: int = None,
+) -> Tuple[list, dict, int]:
+    """
+    Find all the positions of the root with the best score.
+    The search starts in an aspiration window around guess, and is done again with the full window
+    if the best score is out of it.
+    :param board: chessboard
+    :param ai_num: The player number which ai is
+    :param points: positions to search, from points_gen
+    :param depth: depth of calculation after the root
+    :param context: state of the search
+    :param control_bar: class Bar from main.py
+    :param guess: expected best score, usually the one of the last iteration, None for no aspiration window
+    :return: (positions with the best score, {position: score or upper bound of it}, best score)
+    """
+    if guess is not None:
+        alpha, beta = guess - ASPIRATION_WINDOW, guess + ASPIRATION_WINDOW
+        result = search_window(board, ai_num, points, depth, alpha, beta, context, control_bar)
+        if alpha < result[2] < beta:
+            return result
+    return search_window(
+        board, ai_num, points, depth, -INFINITY, INFINITY, context, control_bar
+    )
+
+
+def search_window(
+        board: ChessBoard,
+        ai_num: int,
+        points: list,
+        depth: int,
+        alpha: int,
+        beta: int,
+        context: SearchContext,
+        control_bar,
+) -> Tuple[list, dict, int]:
+    """
+    Search the root in a window. Once a position has an exact score, the others are first searched
+    with a null window just below it, which proves most of them worse at a low cost.
+    Those which are not are searched again, so that every position as good as the best is found.
+    :return: (positions with the best score, {position: score or upper bound of it}, best score).
+    The best score is alpha or less if no position beats alpha, beta or more if one reaches beta.
+    """
+    opponent = 1 if ai_num == 2 else 2
+    best = alpha
     candidates = []
+    scores = {}
 
     # Show progress bar
     for point in points:
         control_bar.step_in()
 
-        board.board[point[0]][point[1]] = ai_num
-        cur_v = search_point(
-            board, ai_num, 1 if ai_num == 2 else 2, depth, -9999999999, 9999999999
-        )
-        if cur_v == max_v:
-            candidates.append(point)
-        elif cur_v > max_v:
-            max_v = cur_v
+        board.make(point[0], point[1], ai_num)
+        try:
+            if not candidates:
+                cur_v = -search_point(
+                    board, ai_num, opponent, depth, -beta, -best, context
+                )
+            else:
+                # Window (best - 1, best): is the position at least as good as the best one?
+                cur_v = -search_point(
+                    board, ai_num, opponent, depth, -best, 1 - best, context
+                )
+                if cur_v >= best:
+                    cur_v = -search_point(
+                        board, ai_num, opponent, depth, -beta, -best, context
+                    )
+        finally:
+            board.unmake()
+        scores[point] = cur_v
+        if cur_v > best:
+            best = cur_v
             candidates = [point]
-        board.board[point[0]][point[1]] = 0
-    result = sample(candidates, 1)[0]
-    control_bar.exit()
-    return result
+        elif cur_v == best and candidates:
+            candidates.append(point)
+        if best >= beta:
+            break
+    for point in points:
+        scores.setdefault(point, best)
+    return candidates, scores, best
 
 
 # TODO: need speed up
-@lru_cache()
 def search_point(
-        board: ChessBoard, ai_num: int, player: int, depth: int, alpha: int, beta: int
-):
+        board: ChessBoard,
+        ai_num: int,
+        player: int,
+        depth: int,
+        alpha: int,
+        beta: int,
+        context: SearchContext,
+) -> int:
     """
-    This function use alpha-beta pruning to calculate best-fit point
+    Negamax principal variation search: the first move is searched with the window (alpha, beta),
+    the others with a null window, and again with the full window only if they beat alpha.
     :param board: chessboard
     :param ai_num: The player number which ai is
     :param player: current player number
     :param depth: maximum depth of calculation
-    :param alpha: max value when calculate
-    :param beta: min value when calculate
-    :return: the maximum score of the position
-    """
-    # Computer - Human
-    split_board = list(board.split_board())
-    v = board.evaluate(ai_num, split_board) - board.evaluate(
-        1 if ai_num == 2 else 2, split_board
-    )
+    :param alpha: score the player is already sure to get
+    :param beta: score the opponent is already sure to hold the player to
+    :param context: state of the search
+    :return: the score of the position for the player to move, at most alpha if no move beats alpha
+    and at least beta if a move reaches beta
+    """
+    context.nodes += 1
+    if not context.nodes & 63 and context.stopped():
+        raise SearchTimeout
+    stats = context.stats
+    if stats is not None:
+        stats.nodes_by_depth[depth] += 1
+        stats.table_probes += 1
+
+    table = context.table
+    key = board.hash ^ SIDE_KEYS[player]
+    entry = table.probe(key)
+    hash_move = None
+    if entry is not None:
+        _, entry_depth, bound, score, hash_move, _ = entry
+        if stats is not None:
+            stats.table_hits += 1
+        if entry_depth >= depth and (
+                bound == EXACT
+                or (bound == LOWER and score >= beta)
+                or (bound == UPPER and score <= alpha)
+        ):
+            if stats is not None:
+                stats.table_cutoffs += 1
+            return score
+
+    opponent = 1 if player == 2 else 2
     if depth <= 0 or board.win_determine() in [WHITE_WIN, BLACK_WIN, TIE]:
+        # Player to move - opponent
+        v = board.scores[player] - board.scores[opponent]
+        table.store(key, depth, EXACT, v, None)
         return v
-    points = points_gen(board, player)
-
-    if player == ai_num:
-        # Computer turn, max level
-        for point in points:
-            board.board[point[0]][point[1]] = player
-            cur_v = search_point(
-                board, ai_num, 1 if player == 2 else 2, depth - 1, alpha, beta
-            )
-            board.board[point[0]][point[1]] = 0
-            alpha = max(alpha, cur_v)
-            # Prune
-            if beta < alpha:
-                # print("Pruned {} nodes".format(len(points) - points.index(point) - 1))
+    # Search the best move of the last search first, then the moves which made cutoffs elsewhere
+    ordering = context.ordering
+    if stats is not None:
+        start_time = time.perf_counter()
+    points = ordering.order(points_gen(board, player), player, depth, hash_move)
+    if stats is not None:
+        stats.generation_time += time.perf_counter() - start_time
+        stats.interior_nodes += 1
+        stats.moves_generated += len(points)
+
+    alpha_origin = alpha
+    best_move = None
+    for index, point in enumerate(points):
+        if context.shared_beta is not None and depth == context.shared_depth:
+            beta = min(beta, context.shared_beta())
+            if alpha >= beta:
                 break
-        return alpha
+        if stats is not None:
+            stats.moves_searched += 1
+            start_time = time.perf_counter()
+        board.make(point[0], point[1], player)
+        if stats is not None:
+            stats.evaluation_time += time.perf_counter() - start_time
+        try:
+            if index == 0:
+                cur_v = -search_point(
+                    board, ai_num, opponent, depth - 1, -beta, -alpha, context
+                )
+            else:
+                cur_v = -search_point(
+                    board, ai_num, opponent, depth - 1, -alpha - 1, -alpha, context
+                )
+                if alpha < cur_v < beta:
+                    cur_v = -search_point(
+                        board, ai_num, opponent, depth - 1, -beta, -alpha, context
+                    )
+        finally:
+            if stats is not None:
+                start_time = time.perf_counter()
+            board.unmake()
+            if stats is not None:
+                stats.evaluation_time += time.perf_counter() - start_time
+        if cur_v > alpha:
+            alpha = cur_v
+            best_move = point
+        # Prune
+        if alpha >= beta:
+            ordering.cutoff(player, depth, point)
+            if stats is not None:
+                stats.cutoffs += 1
+                stats.first_move_cutoffs += index == 0
+            break
+    if alpha <= alpha_origin:
+        bound = UPPER
+    elif alpha >= beta:
+        bound = LOWER
     else:
-        # Human turn, min level
-        for point in points:
-            board.board[point[0]][point[1]] = player
-            cur_v = search_point(
-                board, ai_num, 1 if player == 2 else 2, depth - 1, alpha, beta
-            )
-            board.board[point[0]][point[1]] = 0
-            beta = min(beta, cur_v)
-            # Prune
-            if beta < alpha:
-                print("Pruned {} nodes".format(len(points) - points.index(point) - 1))
-                break
-        return beta
+        bound = EXACT
+    table.store(key, depth, bound, alpha, best_move)
+    return alpha
+
+
+def principal_variation(
+        board: ChessBoard, ai_num: int, position: Tuple[int, int], table: TranspositionTable
+) -> list:
+    """
+    Follow the best moves stored in the transposition table after a position of the root
+    :param board: chessboard of the root
+    :param ai_num: The player number which ai is
+    :param position: the position of the root to start with
+    :param table: transposition table of the search
+    :return: the moves of the principal variation, starting with position
+    """
+    pv = [position]
+    player = ai_num
+    board.make(position[0], position[1], player)
+    while len(pv) < 225 and board.win_determine() == CONTINUE:
+        player = 1 if player == 2 else 2
+        entry = table.probe(board.hash ^ SIDE_KEYS[player])
+        if entry is None or entry[4] is None or board.board[entry[4][0]][entry[4][1]] != 0:
+            break
+        pv.append(entry[4])
+        board.make(entry[4][0], entry[4][1], player)
+    for _ in pv:
+        board.unmake()
+    return pv
 
 
 def points_gen(board: ChessBoard, player: int, distance: int = 2) -> list:
@@ -116,37 +439,40 @@ def points_gen(board: ChessBoard, player: int, distance: int = 2) -> list:
     :return:
     """
     five, four, double_three, three, two, others, far = [], [], [], [], [], [], []
-    for x in range(15):
-        for y in range(15):
-            if board.board[x][y] == 0:
-                if has_neighbor(board, (x, y), 1):
-                    score_com = evaluate_point(board, (x, y), player)
-                    score_hum = evaluate_point(board, (x, y), 1 if player == 2 else 2)
-
-                    if score_com >= STANDARDS["5+"]:
-                        return [(x, y)]
-                    elif score_hum >= STANDARDS["5+"]:
-                        five.append((x, y))
-                    elif score_com >= STANDARDS["4+"]:
-                        four.insert(0, (x, y))
-                    elif score_hum >= STANDARDS["4-"]:
-                        four.append((x, y))
-                    elif score_com >= STANDARDS["3+"] * 2:
-                        double_three.insert(0, (x, y))
-                    elif score_hum >= STANDARDS["3+"] * 2:
-                        double_three.append((x, y))
-                    elif score_com >= STANDARDS["3+"]:
-                        three.insert(0, (x, y))
-                    elif score_hum >= STANDARDS["3+"]:
-                        three.append((x, y))
-                    elif score_com >= STANDARDS["2+"]:
-                        two.insert(0, (x, y))
-                    elif score_hum >= STANDARDS["2+"]:
-                        two.append((x, y))
-                    else:
-                        others.append((x, y))
-                elif has_neighbor(board, (x, y), 2):
-                    far.append((x, y))
+    attack, defence = board.score_maps(player)
+    standards = profile_standards()
+    near = board.near[1]
+    # Only the empty cells within distance 2 of a chess, in the order of x then y
+    for index in sorted(board.frontier):
+        x, y = divmod(index, 15)
+        if near[index]:
+            score_com = attack[index]
+            score_hum = defence[index]
+
+            if score_com >= standards["5+"]:
+                return [(x, y)]
+            elif score_hum >= standards["5+"]:
+                five.append((x, y))
+            elif score_com >= standards["4+"]:
+                four.insert(0, (x, y))
+            elif score_hum >= standards["4-"]:
+                four.append((x, y))
+            elif score_com >= standards["3+"] * 2:
+                double_three.insert(0, (x, y))
+            elif score_hum >= standards["3+"] * 2:
+                double_three.append((x, y))
+            elif score_com >= standards["3+"]:
+                three.insert(0, (x, y))
+            elif score_hum >= standards["3+"]:
+                three.append((x, y))
+            elif score_com >= standards["2+"]:
+                two.insert(0, (x, y))
+            elif score_hum >= standards["2+"]:
+                two.append((x, y))
+            else:
+                others.append((x, y))
+        else:
+            far.append((x, y))
     if five:
         return [five[0]]
     if four:
@@ -167,20 +493,7 @@ def has_neighbor(board: ChessBoard, point: Tuple[int, int], depth: int) -> bool:
     :param point: point wants to calculate
     :return: whether a point has neighbor which is filled
     """
-    x, y = point
-    all_points = [
-        board.board[cx][cy]
-        # (cx, cy)
-        for cx in range(
-            x - depth if x - depth >= 0 else 0, x + depth + 1 if x + depth <= 14 else 15
-        )
-        for cy in range(
-            y - depth if y - depth >= 0 else 0, y + depth + 1 if y + depth <= 14 else 15
-        )
-    ]
-    if any((1 in all_points, 2 in all_points)):
-        return True
-    return False
+    return board.has_neighbor(point[0], point[1], depth)
 
 
 if __name__ == "__main__":
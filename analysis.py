@@ -0,0 +1,206 @@
+"""
+Headless analysis of many positions by a pool of processes, without the GUI.
+Run this file to analyse the positions of a file, or of stdin if it is "-" or not given:
+python analysis.py [positions.txt] [depth] [workers] [time]
+A position is either one line of moves "x,y x,y ...", played alternately from black,
+or a board written like ChessBoard.__repr__: the line of x coordinates followed by the 15 lines of y.
+Blank lines and lines starting with "#" are skipped.
+The results are written to stdout as JSON lines, in the order of the positions.
+"""
+import json
+import os
+import random
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable, Iterator, Tuple
+
+import ai
+from board import ChessBoard, format_number
+from constants import *
+from transposition import TranspositionTable
+
+# First line of a board written by ChessBoard.__repr__
+BOARD_HEADER = [format_number(x) for x in range(15)]
+
+# Number of positions given to the pool ahead of the one written next, for each worker
+QUEUE_PER_WORKER = 4
+
+
+def read_positions(lines: Iterable[str]) -> Iterator[str]:
+    """
+    Split the input into the texts of the positions, reading one line at a time
+    :param lines: lines of the input
+    :return: text of every position, one line of moves or the 16 lines of a board
+    """
+    lines = iter(lines)
+    for line in lines:
+        if not line.strip() or line.lstrip().startswith("#"):
+            continue
+        if line.split() == BOARD_HEADER:
+            rows = [line]
+            for row in lines:
+                rows.append(row)
+                if len(rows) == 16:
+                    break
+            yield "".join(rows)
+        else:
+            yield line
+
+
+def parse_position(text: str) -> Tuple[ChessBoard, int]:
+    """
+    :param text: text of a position from read_positions
+    :return: (chessboard, player to move). The player to move is black if both have as many chess, otherwise white
+    """
+    rows = text.splitlines()
+    if rows[0].split() == BOARD_HEADER:
+        if len(rows) != 16:
+            raise ValueError("Board must have 15 lines of cells, {} given!".format(len(rows) - 1))
+        data = [[0] * 15 for _ in range(15)]
+        for y, row in enumerate(rows[1:]):
+            cells = row.split()
+            if len(cells) != 16 or cells[0] != format_number(y):
+                raise ValueError("Line {} of the board is malformed, {} given!".format(y, row.strip()))
+            for x, cell in enumerate(cells[1:]):
+                if cell not in ("0", "1", "2"):
+                    raise ValueError("Cell must be 0, 1 or 2, {} given!".format(cell))
+                data[x][y] = int(cell)
+        counts = [sum(column.count(player) for column in data) for player in (1, 2)]
+        board = ChessBoard("c", "c", data=data)
+        board.next_turn = 1 if counts[0] == counts[1] else 2
+        return board, board.next_turn
+    board = ChessBoard("c", "c")
+    for move in text.split():
+        try:
+            x, y = (int(value) for value in move.split(","))
+        except ValueError:
+            raise ValueError("Move must be x,y, {} given!".format(move))
+        if not (0 <= x < 15 and 0 <= y < 15) or board.board[x][y]:
+            raise ValueError("Move must be on an empty cell of the board, {} given!".format(move))
+        board.set_chess(x, y)
+    return board, board.next_turn
+
+
+# Transposition table of a worker process, kept between positions
+_table = None
+
+
+def _init_worker(table_size_mb: int):
+    global _table
+    _table = TranspositionTable(table_size_mb)
+
+
+def analyse_position(
+        index: int,
+        text: str,
+        depth: int,
+        time_limit: float = None,
+        use_book: bool = True,
+        use_threats: bool = THREAT_SEARCH,
+) -> dict:
+    """
+    Search one position from a cold start: empty transposition table, move ordering and threat space search cache,
+    so that the result does not depend on the positions searched before by the worker
+    :param index: number of the position in the input, also the seed of the random choice between equal positions
+    :param text: text of the position from read_positions
+    :param depth: depth of calculation of min_max_search
+    :param time_limit: seconds for the search, None for no limit
+    :param use_book: whether to play the position of the opening book when there is one
+    :param use_threats: whether to look for a forced win by threats before the full search
+    :return: result: index, player to move, best move, its score and principal variation, depth, nodes,
+    static evaluation for the player to move and seconds. Score, pv and depth are None if the move is not searched
+    (empty board, opening book or forced win). A finished game only has its result, and a malformed position an error.
+    """
+    try:
+        board, player = parse_position(text)
+    except ValueError as error:
+        return {"index": index, "error": str(error)}
+    result = board.win_determine()
+    if result != CONTINUE:
+        return {"index": index, "result": {BLACK_WIN: "black", WHITE_WIN: "white", TIE: "tie"}[result]}
+    table = _table if _table is not None else TranspositionTable(TT_SIZE_MB)
+    table.clear()
+    ai.ORDERING.clear()
+    ai.SOLVER.cache.clear()
+    random.seed(index)
+    info = {}
+    start_time = time.time()
+    position = ai.min_max_search(
+        board,
+        player,
+        ai.NullBar(),
+        depth,
+        table=table,
+        time_limit=time_limit,
+        use_book=use_book,
+        use_threats=use_threats,
+        info=info,
+    )
+    opponent = 1 if player == 2 else 2
+    return {
+        "index": index,
+        "player": player,
+        "move": list(position),
+        "score": info.get("score"),
+        "pv": [list(point) for point in info["pv"]] if "pv" in info else None,
+        "depth": info.get("depth"),
+        "nodes": info.get("nodes", 0),
+        "evaluation": board.scores[player] - board.scores[opponent],
+        "seconds": time.time() - start_time,
+    }
+
+
+def analyse(
+        lines: Iterable[str],
+        depth: int = AI_DEPTH,
+        workers: int = None,
+        time_limit: float = None,
+        use_book: bool = True,
+        use_threats: bool = THREAT_SEARCH,
+        table_size_mb: int = ARENA_TT_SIZE_MB,
+) -> Iterator[dict]:
+    """
+    Analyse the positions of the input with a pool of processes.
+    Only a few positions per worker are read ahead of the result given next, so that the memory used
+    does not grow with the input.
+    :param lines: lines of the input, see read_positions
+    :param workers: number of processes, the number of cpus by default
+    :param table_size_mb: memory budget of the transposition table of each worker
+    :return: results of analyse_position, in the order of the input
+    """
+    workers = workers or os.cpu_count()
+    pending = deque()
+    with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(table_size_mb,)) as pool:
+        for index, text in enumerate(read_positions(lines)):
+            if len(pending) >= workers * QUEUE_PER_WORKER:
+                yield pending.popleft().result()
+            pending.append(
+                pool.submit(analyse_position, index, text, depth, time_limit, use_book, use_threats)
+            )
+        while pending:
+            yield pending.popleft().result()
+
+
+if __name__ == "__main__":
+    path = sys.argv[1] if len(sys.argv) > 1 else "-"
+    source = sys.stdin if path == "-" else open(path)
+    start_time = time.time()
+    count = 0
+    try:
+        for analysis in analyse(
+                source,
+                int(sys.argv[2]) if len(sys.argv) > 2 else AI_DEPTH,
+                int(sys.argv[3]) if len(sys.argv) > 3 else None,
+                float(sys.argv[4]) if len(sys.argv) > 4 else None,
+        ):
+            print(json.dumps(analysis), flush=True)
+            count += 1
+    finally:
+        if source is not sys.stdin:
+            source.close()
+    print(
+        "{} positions analysed in {:.1f}s".format(count, time.time() - start_time),
+        file=sys.stderr,
+    )
@@ -0,0 +1,226 @@
+"""
+Headless arena: computer vs. computer games played by a pool of processes, without the GUI.
+Run this file to play a match between two engines:
+python arena.py games workers engine_a engine_b [records.jsonl]
+An engine is written as comma separated settings, e.g. "depth=4,time=1,profile=alternative,book=0".
+"""
+import json
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Union
+
+import ai
+import board as board_module
+from board import ChessBoard
+from constants import *
+from ordering import MoveOrdering
+from transposition import TranspositionTable
+
+
+class Engine:
+    """
+    Settings of one side of the arena
+    """
+
+    def __init__(
+            self,
+            depth: int = AI_DEPTH,
+            time_limit: Union[float, None] = None,
+            profile: str = "default",
+            book: bool = True,
+            name: str = None,
+    ):
+        """
+        :param depth: depth of calculation of min_max_search
+        :param time_limit: seconds for each move, None for no limit
+        :param profile: evaluation profile, key of PROFILES
+        :param book: whether to play the positions of the opening book
+        :param name: name in the results, made from the settings by default
+        """
+        if profile not in PROFILES:
+            raise ValueError(
+                "Profile must be one of {}, {} given!".format(list(PROFILES), profile)
+            )
+        self.depth = depth
+        self.time_limit = time_limit
+        self.profile = profile
+        self.book = book
+        self.name = name or "d{}{}-{}{}".format(
+            depth,
+            "" if time_limit is None else "-t{:g}".format(time_limit),
+            profile,
+            "" if book else "-nobook",
+        )
+
+    @classmethod
+    def parse(cls, text: str) -> "Engine":
+        """
+        :param text: comma separated key=value settings: depth, time, profile, book (0 or 1) and name
+        :return: the engine
+        """
+        settings = {}
+        for item in filter(None, text.split(",")):
+            key, _, value = item.partition("=")
+            if key == "depth":
+                settings["depth"] = int(value)
+            elif key == "time":
+                settings["time_limit"] = float(value)
+            elif key == "profile":
+                settings["profile"] = value
+            elif key == "book":
+                settings["book"] = value not in ("0", "false", "no")
+            elif key == "name":
+                settings["name"] = value
+            else:
+                raise ValueError("Unknown engine setting {} in {}!".format(key, text))
+        return cls(**settings)
+
+
+def random_opening(seed: int, stones: int) -> list:
+    """
+    :param seed: seed of the opening, the same seed gives the same opening
+    :param stones: number of chess placed at random near the center
+    :return: list of (x, y), played alternately from black
+    """
+    rng = random.Random(seed)
+    return rng.sample([(x, y) for x in range(5, 10) for y in range(5, 10)], stones)
+
+
+# Transposition tables and move orderings of a worker process, one per side, kept between games
+_tables = {}
+_orderings = {}
+
+
+def play_game(black: Engine, white: Engine, opening: list, seed: int) -> dict:
+    """
+    Play one game to the end
+    :param black: engine playing black
+    :param white: engine playing white
+    :param opening: moves played before the engines, from random_opening
+    :param seed: seed of the random choice between positions of equal scores
+    :return: game record: engines, opening, moves (including the opening), result and seconds of every move
+    """
+    random.seed(seed)
+    board = ChessBoard("c", "c")
+    result = CONTINUE
+    for x, y in opening:
+        result = board.set_chess(x, y)
+    engines = [None, black, white]
+    times = []
+    while result == CONTINUE:
+        player = board.next_turn
+        engine = engines[player]
+        board_module.use_profile(engine.profile)
+        board.rescore()
+        table = _tables.setdefault(player, TranspositionTable(ARENA_TT_SIZE_MB))
+        ordering = _orderings.setdefault(player, MoveOrdering())
+        start_time = time.time()
+        position = ai.min_max_search(
+            board,
+            player,
+            ai.NullBar(),
+            engine.depth,
+            table=table,
+            time_limit=engine.time_limit,
+            ordering=ordering,
+            use_book=engine.book,
+        )
+        times.append(time.time() - start_time)
+        result = board.set_chess(*position)
+    for table in _tables.values():
+        table.clear()
+    for ordering in _orderings.values():
+        ordering.clear()
+    return {
+        "black": black.name,
+        "white": white.name,
+        "opening": len(opening),
+        "moves": [list(position) for _, position in board.operations],
+        "result": {BLACK_WIN: "black", WHITE_WIN: "white", TIE: "tie"}[result],
+        "times": times,
+    }
+
+
+def run_match(
+        engine_a: Engine,
+        engine_b: Engine,
+        games: int,
+        workers: int = None,
+        records=None,
+        opening_stones: int = ARENA_OPENING_STONES,
+) -> dict:
+    """
+    Play a match between two engines. Every opening is played twice, each engine taking black once.
+    :param engine_a: first engine, the results are given from its side
+    :param engine_b: second engine
+    :param games: number of games
+    :param workers: number of processes, the number of cpus by default
+    :param records: text file to stream the game records to as JSON lines, in the order the games end
+    :param opening_stones: number of random chess of the openings
+    :return: summary of the match: wins, losses and ties of engine_a, its score rate,
+    average seconds per move of both engines, and games per second
+    """
+    if engine_a.name == engine_b.name:
+        engine_b.name += "-b"
+    start_time = time.time()
+    wins = losses = ties = 0
+    move_times = {engine_a.name: [], engine_b.name: []}
+    with ProcessPoolExecutor(workers or os.cpu_count()) as pool:
+        futures = []
+        for game in range(games):
+            black, white = (engine_a, engine_b) if game % 2 == 0 else (engine_b, engine_a)
+            opening = random_opening(game // 2, opening_stones)
+            futures.append(pool.submit(play_game, black, white, opening, game))
+        for future in as_completed(futures):
+            record = future.result()
+            if records is not None:
+                records.write(json.dumps(record) + "\n")
+                records.flush()
+            if record["result"] == "tie":
+                ties += 1
+            elif record[record["result"]] == engine_a.name:
+                wins += 1
+            else:
+                losses += 1
+            # The engines move alternately, starting with the side to move after the opening
+            first = "black" if record["opening"] % 2 == 0 else "white"
+            second = "white" if first == "black" else "black"
+            move_times[record[first]] += record["times"][0::2]
+            move_times[record[second]] += record["times"][1::2]
+    used_time = time.time() - start_time
+    return {
+        "engine": engine_a.name,
+        "opponent": engine_b.name,
+        "games": games,
+        "wins": wins,
+        "losses": losses,
+        "ties": ties,
+        "score_rate": (wins + ties / 2) / games if games else 0,
+        "seconds_per_move": {
+            name: sum(values) / len(values) if values else 0
+            for name, values in move_times.items()
+        },
+        "games_per_second": games / used_time,
+    }
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 5:
+        print(__doc__, file=sys.stderr)
+        sys.exit(1)
+    record_file = open(sys.argv[5], "w") if len(sys.argv) > 5 else None
+    try:
+        summary = run_match(
+            Engine.parse(sys.argv[3]),
+            Engine.parse(sys.argv[4]),
+            int(sys.argv[1]),
+            int(sys.argv[2]),
+            record_file,
+        )
+    finally:
+        if record_file is not None:
+            record_file.close()
+    print(json.dumps(summary, indent=2), file=sys.stderr)
@@ -0,0 +1,101 @@
+"""
+Evaluate many boards at once with NumPy, for analysis of large sets of positions.
+The results are the same as ChessBoard.evaluate on every board.
+"""
+from typing import List
+
+import numpy as np
+
+from board import LINES, ChessBoard
+from constants import *
+
+# Extra cells appended after the 225 cells of a flattened board
+FILLER = 225  # value 3, never fits a pattern. Fills lines shorter than 15 cells
+BORDER = 226  # the opponent of the player being scored, put before the first cell of every line
+
+# Lines as read by fit_pattern: the border, then every cell of the line except the last one, padded by the filler.
+# LINE_INDEX[line][n] is the index in the extended board of the n-th cell read.
+LINE_INDEX = np.full((len(LINES), 15), FILLER, dtype=np.intp)
+LINE_INDEX[:, 0] = BORDER
+for _line, _cells in enumerate(LINES):
+    for _pos, (_x, _y) in enumerate(_cells[:-1]):
+        LINE_INDEX[_line, _pos + 1] = _x * 15 + _y
+LINE_LENGTH = np.array([len(cells) for cells in LINES])
+
+
+def _build_tables(patterns: dict, standards: dict) -> dict:
+    """
+    Compile the patterns into score tables of windows encoded in base 4
+    :return: tables[player][length] -> array of size 4 ** length, score of every window
+    """
+    tables = {1: {}, 2: {}}
+    for pattern_type in patterns:
+        for player in (1, 2):
+            for pattern in patterns[pattern_type][player]:
+                table = tables[player].setdefault(
+                    len(pattern), np.zeros(4 ** len(pattern), dtype=np.int64)
+                )
+                code = 0
+                for value in pattern:
+                    code = code * 4 + value
+                table[code] += standards[pattern_type]
+    return tables
+
+
+TABLES = _build_tables(PATTERNS, STANDARDS)
+
+
+def boards_to_array(boards: List[ChessBoard]) -> np.ndarray:
+    """
+    :param boards: ChessBoard objects
+    :return: (N, 15, 15) int8 array, [n][x][y] = boards[n].board[x][y]
+    """
+    return np.array([board.board for board in boards], dtype=np.int8)
+
+
+def evaluate_batch(boards: np.ndarray, chunk_size: int = 4096) -> np.ndarray:
+    """
+    Evaluate the situation on many chessboards for both players
+    :param boards: (N, 15, 15) int8 array of 0, 1 and 2, indexed like ChessBoard.board
+    :param chunk_size: number of boards evaluated together, bounds the memory used
+    :return: (N, 2) int64 array, [n][player - 1] = ChessBoard.evaluate(player, split_board of board n)
+    """
+    boards = np.asarray(boards, dtype=np.int8)
+    if boards.ndim != 3 or boards.shape[1:] != (15, 15):
+        raise ValueError(
+            "Boards must be an array of shape (N, 15, 15), {} given!".format(
+                boards.shape
+            )
+        )
+    # The cells become digits of the window codes indexing TABLES
+    if boards.size and (boards.min() < 0 or boards.max() > 2):
+        raise ValueError(
+            "Cells must be 0, 1 or 2, values from {} to {} given!".format(
+                boards.min(), boards.max()
+            )
+        )
+    result = np.zeros((boards.shape[0], 2), dtype=np.int64)
+    for start in range(0, boards.shape[0], chunk_size):
+        chunk = boards[start: start + chunk_size]
+        extended = np.empty((chunk.shape[0], 227), dtype=np.int32)
+        extended[:, :225] = chunk.reshape(chunk.shape[0], 225)
+        extended[:, FILLER] = 3
+        for player in (1, 2):
+            extended[:, BORDER] = 1 if player == 2 else 2
+            # (boards, lines, cells)
+            lines = extended[:, LINE_INDEX]
+            score = np.zeros(chunk.shape[0], dtype=np.int64)
+            # Codes of all windows of the current length, extended by one cell for every longer length
+            codes = np.zeros_like(lines)
+            length = 0
+            for pattern_length in sorted(TABLES[player]):
+                while length < pattern_length:
+                    windows = 15 - length
+                    codes = codes[:, :, :windows] * 4 + lines[:, :, length:]
+                    length += 1
+                scores = TABLES[player][length][codes]
+                # fit_pattern finds nothing in lines not longer than the pattern
+                scores[:, LINE_LENGTH <= length] = 0
+                score += scores.sum(axis=(1, 2))
+            result[start: start + chunk.shape[0], player - 1] = score
+    return result
@@ -0,0 +1,275 @@
+"""
+Benchmark suite of the engine on a fixed corpus of positions.
+Results are written as JSON, so that two versions can be compared:
+python benchmark.py [results.json] [max depth]
+python benchmark.py compare old.json new.json
+"""
+import json
+import platform
+import random
+import subprocess
+import sys
+import time
+
+import ai
+from board import ChessBoard, fit_pattern_old
+from constants import *
+from core_algorithm.algorithms import (
+    evaluate_buffer,
+    evaluate_point,
+    evaluate_point_buffer,
+    fit_pattern,
+    score_line,
+)
+from transposition import TranspositionTable
+
+# Fixed positions, as the moves played alternately from black
+CORPUS = {
+    "opening": [
+        [(7, 7), (7, 8), (8, 8)],
+        [(7, 7), (8, 6), (6, 8), (8, 8)],
+        [(7, 7), (6, 7), (8, 6), (6, 6), (8, 8)],
+    ],
+    "midgame": [
+        [(7, 7), (9, 9), (6, 6), (5, 5), (8, 6), (7, 6), (6, 8), (9, 5), (8, 8), (8, 7)],
+        [(5, 9), (8, 8), (6, 10), (4, 8), (5, 8), (5, 10), (3, 11), (6, 8), (6, 11), (6, 12),
+         (7, 10), (6, 9), (8, 7)],
+        [(6, 7), (6, 9), (6, 6), (6, 5), (7, 7), (5, 7), (5, 9), (8, 6), (7, 6), (7, 8),
+         (8, 7), (5, 8)],
+    ],
+    "tactical": [
+        # Black to move has a victory by continuous threats
+        [(5, 6), (5, 7), (6, 7), (4, 5), (6, 6), (6, 5), (3, 5), (3, 6), (5, 4), (7, 6),
+         (4, 4), (7, 5)],
+        [(6, 7), (7, 6), (7, 8), (5, 6), (6, 8), (6, 9), (5, 7), (7, 7), (6, 6), (4, 8),
+         (4, 7), (8, 8)],
+        # Black to move must block a four of white
+        [(6, 7), (6, 9), (6, 6), (6, 5), (7, 7), (5, 7), (5, 9), (8, 6), (7, 6), (7, 8),
+         (8, 7), (5, 8), (6, 8), (5, 5), (7, 5), (5, 6)],
+    ],
+}
+
+# Number of times every measure is repeated, the fastest one is kept
+REPEAT = 5
+
+
+def corpus_boards() -> list:
+    """
+    :return: list of (category, index, board) of every position of CORPUS
+    """
+    boards = []
+    for category, positions in CORPUS.items():
+        for index, moves in enumerate(positions):
+            board = ChessBoard("c", "c")
+            for x, y in moves:
+                board.set_chess(x, y)
+            boards.append((category, index, board))
+    return boards
+
+
+def measure(function, calls: int) -> float:
+    """
+    :param function: function without arguments, doing `calls` operations
+    :param calls: number of operations done by one call of function
+    :return: operations per second of the fastest of REPEAT runs
+    """
+    best = None
+    for _ in range(REPEAT):
+        start_time = time.perf_counter()
+        function()
+        used_time = time.perf_counter() - start_time
+        if best is None or used_time < best:
+            best = used_time
+    return calls / best if best else float("inf")
+
+
+def bench_functions(boards: list) -> dict:
+    """
+    Throughput of the evaluation functions on all the positions, in calls per second
+    """
+    lines = [line for _, _, board in boards for line in board.split_board()]
+    patterns = [
+        (pattern, player)
+        for pattern_type in PATTERNS
+        for player in (1, 2)
+        for pattern in PATTERNS[pattern_type][player]
+    ]
+    points = [
+        (board, (x, y), player)
+        for _, _, board in boards
+        for x in range(15)
+        for y in range(15)
+        if board.board[x][y] == 0 and board.has_neighbor(x, y, 2)
+        for player in (1, 2)
+    ]
+    last_moves = [(board, board.operations[-1][1]) for _, _, board in boards]
+    # A move made and taken back on every board, which scores its lines again
+    moves = [(board, divmod(min(board.frontier), 15)) for _, _, board in boards]
+
+    def make_unmake():
+        for board, (x, y) in moves:
+            for player in (1, 2):
+                board.make(x, y, player)
+                board.unmake()
+
+    def generate():
+        # points_gen reads the cache of score_maps, which a repeated call on an unchanged board finds up to date.
+        # The move made before every call makes it score the changed lines again, like at a node of the search.
+        for board, (x, y) in moves:
+            for player in (1, 2):
+                board.make(x, y, player)
+                board.unmake()
+                ai.points_gen(board, player)
+
+    def fit_all(fit):
+        return [fit(line, pattern, player) for line in lines for pattern, player in patterns]
+
+    # Both kernels must find the same patterns before their speed is compared
+    if fit_all(fit_pattern) != fit_all(fit_pattern_old):
+        raise AssertionError("fit_pattern and fit_pattern_old disagree on the corpus!")
+
+    fit_calls = len(lines) * len(patterns)
+    results = {
+        "fit_pattern": measure(lambda: fit_all(fit_pattern), fit_calls),
+        "fit_pattern_old": measure(lambda: fit_all(fit_pattern_old), fit_calls),
+        "score_line": measure(
+            lambda: [score_line(line, player) for line in lines for player in (1, 2)],
+            len(lines) * 2,
+        ),
+        "evaluate_point": measure(
+            lambda: [evaluate_point(board, point, player) for board, point, player in points],
+            len(points),
+        ),
+        "evaluate_point_buffer": measure(
+            lambda: [
+                evaluate_point_buffer(board.buffer, point[0], point[1], player)
+                for board, point, player in points
+            ],
+            len(points),
+        ),
+        "evaluate_buffer": measure(
+            lambda: [
+                evaluate_buffer(board.buffer, player) for _, _, board in boards for player in (1, 2)
+            ],
+            len(boards) * 2,
+        ),
+        "evaluate": measure(
+            lambda: [
+                ChessBoard.evaluate(player, list(board.split_board()))
+                for _, _, board in boards
+                for player in (1, 2)
+            ],
+            len(boards) * 2,
+        ),
+        "make_unmake": measure(make_unmake, len(moves) * 2),
+        "points_gen": measure(generate, len(moves) * 2),
+        "win_determine": measure(
+            lambda: [board.win_determine() for _, _, board in boards], len(boards)
+        ),
+        "win_determine_last": measure(
+            lambda: [board.win_determine(x, y) for board, (x, y) in last_moves],
+            len(last_moves),
+        ),
+    }
+    results["fit_pattern_speedup"] = results["fit_pattern"] / results["fit_pattern_old"]
+    return results
+
+
+def bench_search(boards: list, max_depth: int) -> dict:
+    """
+    Time to depth and nodes per second of min_max_search on every position, from a cold start:
+    empty transposition table and move ordering, no opening book and no threat space search
+    """
+    results = {}
+    for category, index, board in boards:
+        position = {}
+        for depth in range(1, max_depth + 1):
+            ai.ORDERING.clear()
+            random.seed(0)
+            info = {}
+            start_time = time.perf_counter()
+            move = ai.min_max_search(
+                board,
+                board.next_turn,
+                ai.NullBar(),
+                depth,
+                table=TranspositionTable(16),
+                use_book=False,
+                use_threats=False,
+                info=info,
+            )
+            used_time = time.perf_counter() - start_time
+            position[str(depth)] = {
+                "seconds": used_time,
+                "nodes": info.get("nodes", 0),
+                "nodes_per_second": info.get("nodes", 0) / used_time,
+                "score": info.get("score"),
+                "move": list(move),
+            }
+        results["{}-{}".format(category, index)] = position
+    return results
+
+
+def run(max_depth: int = 3) -> dict:
+    """
+    :param max_depth: deepest search measured
+    :return: all the results, with the version of the code and of Python
+    """
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    boards = corpus_boards()
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "functions": bench_functions(boards),
+        "search": bench_search(boards, max_depth),
+    }
+
+
+def compare(old: dict, new: dict):
+    """
+    Print the ratio new / old of every throughput, and the changes of search results
+    """
+    for name, value in new["functions"].items():
+        if name in old["functions"]:
+            print(
+                "{:24s} {:>14.6g} -> {:>14.6g}  x{:.2f}".format(
+                    name, old["functions"][name], value, value / old["functions"][name]
+                )
+            )
+    for position, depths in new["search"].items():
+        for depth, result in depths.items():
+            old_result = old["search"].get(position, {}).get(depth)
+            if old_result is None:
+                continue
+            print(
+                "{:12s} depth {}  time x{:.2f}  nodes {:8d} -> {:8d}{}".format(
+                    position,
+                    depth,
+                    result["seconds"] / old_result["seconds"],
+                    old_result["nodes"],
+                    result["nodes"],
+                    "" if result["score"] == old_result["score"] else
+                    "  score {} -> {}".format(old_result["score"], result["score"]),
+                )
+            )
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "compare":
+        with open(sys.argv[2]) as old_file, open(sys.argv[3]) as new_file:
+            compare(json.load(old_file), json.load(new_file))
+    else:
+        output = json.dumps(
+            run(int(sys.argv[2]) if len(sys.argv) > 2 else 3), indent=2
+        )
+        if len(sys.argv) > 1:
+            with open(sys.argv[1], "w") as file:
+                file.write(output)
+        else:
+            print(output)
@@ -1,10 +1,163 @@
 import copy
+import random
 from typing import List, Tuple, Union
 
-from core_algorithm.algorithms import fit_pattern
+from core_algorithm.algorithms import DEFAULT_TABLE, PatternTable, evaluate_point_buffer
 
 from constants import *
 
+# Every line of the board, in the order split_board yields them:
+# 15 rows (board[x]), 15 columns, 29 anti-diagonals (x + y fixed) and 29 diagonals (y - x fixed).
+# Cells of a line are listed with x (then y for rows) ascending.
+LINES = (
+        [[(x, y) for y in range(15)] for x in range(15)]
+        + [[(x, y) for x in range(15)] for y in range(15)]
+        + [
+            [(x, base - x) for x in range(max(0, base - 14), min(base, 14) + 1)]
+            for base in range(29)
+        ]
+        + [
+            [(x, x + diff) for x in range(max(0, -diff), min(15, 15 - diff))]
+            for diff in range(-14, 15)
+        ]
+)
+LINE_LENGTHS = [len(line) for line in LINES]
+# Flat index x * 15 + y of the cells of every line
+LINE_INDICES = [tuple(x * 15 + y for x, y in line) for line in LINES]
+# evaluate_point reads the anti-diagonals from the bottom (x descending), the reverse of LINES
+POINT_REVERSED = [15 + 15 <= line < 15 + 15 + 29 for line in range(len(LINES))]
+
+# CELL_LINES[x][y] -> ((line index, bit of the cell in that line), ...) for row, column, anti-diagonal, diagonal
+CELL_LINES = [[[] for _ in range(15)] for _ in range(15)]
+for _index, _line in enumerate(LINES):
+    for _pos, (_x, _y) in enumerate(_line):
+        CELL_LINES[_x][_y].append((_index, 1 << _pos))
+CELL_LINES = [[tuple(cell) for cell in column] for column in CELL_LINES]
+
+# NEAR[distance][x * 15 + y]: flat indices of the cells of the square of that distance around (x, y), itself excluded
+NEAR = [None] + [
+    [
+        tuple(
+            near_x * 15 + near_y
+            for near_x in range(max(x - distance, 0), min(x + distance, 14) + 1)
+            for near_y in range(max(y - distance, 0), min(y + distance, 14) + 1)
+            if (near_x, near_y) != (x, y)
+        )
+        for x in range(15)
+        for y in range(15)
+    ]
+    for distance in (1, 2)
+]
+
+# Zobrist keys: ZOBRIST[player][x][y] is xor-ed into ChessBoard.hash when the player's chess is at (x, y)
+_random = random.Random(ZOBRIST_SEED)
+ZOBRIST = [None] + [
+    [[_random.getrandbits(64) for _ in range(15)] for _ in range(15)] for _ in range(2)
+]
+
+
+def has_five(mask: int) -> bool:
+    """
+    Determine whether a line mask contains five consecutive bits
+    :param mask: bitmask of one player's chess on a line
+    :return: whether there is a five in the line
+    """
+    return bool(mask & mask >> 1 & mask >> 2 & mask >> 3 & mask >> 4)
+
+
+# Scores of line contents for both players, shared by all boards.
+# Key: length | black mask << 4 | white mask << 19, value: (0, black score, white score)
+_LINE_SCORES = {}
+# Score raises of the cells of line contents, shared by all boards.
+# Key: the key of _LINE_SCORES | reversed << 34, value: result of line_deltas
+_LINE_DELTAS = {}
+
+# Evaluation profile in use, see use_profile
+_PROFILE = "default"
+_TABLE = DEFAULT_TABLE
+# name -> (pattern table, _LINE_SCORES, _LINE_DELTAS) of every profile used so far
+_PROFILES = {"default": (DEFAULT_TABLE, _LINE_SCORES, _LINE_DELTAS)}
+
+
+def use_profile(name: str = "default"):
+    """
+    Evaluate all boards with the standards of PROFILES[name] from now on.
+    The caches of every profile are kept, so switching back and forth costs nothing,
+    but boards scored before must be rescored by ChessBoard.rescore.
+    :param name: key of PROFILES
+    """
+    global _PROFILE, _TABLE, _LINE_SCORES, _LINE_DELTAS
+    if name not in PROFILES:
+        raise ValueError(
+            "Profile must be one of {}, {} given!".format(list(PROFILES), name)
+        )
+    if name not in _PROFILES:
+        _PROFILES[name] = (PatternTable(PATTERNS, PROFILES[name]), {}, {})
+    _PROFILE = name
+    _TABLE, _LINE_SCORES, _LINE_DELTAS = _PROFILES[name]
+
+
+def profile_standards() -> dict:
+    """
+    :return: the standards of the evaluation profile in use
+    """
+    return PROFILES[_PROFILE]
+
+
+def line_score(length: int, black: int, white: int) -> tuple:
+    """
+    Score a line for both players, the same as ChessBoard.evaluate on this single line
+    :param length: number of cells in the line
+    :param black: bitmask of black chess in the line
+    :param white: bitmask of white chess in the line
+    :return: (0, score of black, score of white), so that it can be indexed by player number
+    """
+    key = length | black << 4 | white << 19
+    scores = _LINE_SCORES.get(key)
+    if scores is None:
+        line = [(black >> pos & 1) | (white >> pos & 1) << 1 for pos in range(length)]
+        scores = (
+            0,
+            ChessBoard.evaluate(1, [line]) if black else 0,
+            ChessBoard.evaluate(2, [line]) if white else 0,
+        )
+        if len(_LINE_SCORES) >= LINE_CACHE_SIZE:
+            _LINE_SCORES.clear()
+        _LINE_SCORES[key] = scores
+    return scores
+
+
+def line_deltas(length: int, black: int, white: int, reverse: bool) -> tuple:
+    """
+    Score the empty cells of a line for both players, the part of evaluate_point coming from this line
+    :param length: number of cells in the line
+    :param black: bitmask of black chess in the line
+    :param white: bitmask of white chess in the line
+    :param reverse: whether the line is read from its last cell, like evaluate_point reads anti-diagonals
+    :return: tuple of (position in the line, raise for black, raise for white), for cells where a raise is not 0
+    """
+    key = length | black << 4 | white << 19 | reverse << 34
+    deltas = _LINE_DELTAS.get(key)
+    if deltas is None:
+        line = [(black >> pos & 1) | (white >> pos & 1) << 1 for pos in range(length)]
+        if reverse:
+            line.reverse()
+        black_deltas, white_deltas = _TABLE.score_deltas(line, 1), _TABLE.score_deltas(line, 2)
+        if reverse:
+            black_deltas.reverse()
+            white_deltas.reverse()
+        deltas = tuple(
+            (pos, black_delta, white_delta)
+            for pos, (black_delta, white_delta) in enumerate(
+                zip(black_deltas, white_deltas)
+            )
+            if black_delta or white_delta
+        )
+        if len(_LINE_DELTAS) >= LINE_CACHE_SIZE:
+            _LINE_DELTAS.clear()
+        _LINE_DELTAS[key] = deltas
+    return deltas
+
 
 def format_number(num: int, format_length: int = 2) -> str:
     if len(str(num)) == format_length:
@@ -58,6 +211,39 @@ class ChessBoard:
         else:
             self.board = data
 
+        # Bitboard of each player: masks[player][line] has bit n set if the n-th cell of LINES[line] is the player's.
+        # self.board is kept as a list view of the same data, both are updated by place and remove.
+        self.masks = [None, [0] * len(LINES), [0] * len(LINES)]
+        # Zobrist hash of the position, updated together with the masks
+        self.hash = 0
+        # The board as contiguous int8 cells, (x, y) at x * 15 + y, for the buffer functions of core_algorithm.
+        # self.buffer is a (15, 15) view of it
+        self.cells = bytearray(225)
+        self.buffer = memoryview(self.cells).cast("b", (15, 15))
+        # near[distance][x * 15 + y]: number of chess in the square of distance 1 or 2 around (x, y), itself excluded
+        self.near = [None, [0] * 225, [0] * 225]
+        # Empty cells with chess within distance 2, the cells where points_gen looks for moves
+        self.frontier = set()
+        # Number of chess on the board, and fives[player]: number of lines with a five of the player
+        self.stones = 0
+        self.fives = [0, 0, 0]
+        # Positions set by make and not yet taken back by unmake, the last one at the end
+        self.undo_stack = []
+        # Incremental evaluation: line_scores[line] is the result of line_score for the line,
+        # scores[player] is the sum of the player's scores of all lines, equal to self.evaluate on the whole board
+        self.line_scores = [(0, 0, 0)] * len(LINES)
+        self.scores = [0, 0, 0]
+        # Cache of score_maps: point_scores[player][x * 15 + y] is evaluate_point of the cell for the player.
+        # It is the sum of line_deltas of every line, line_deltas[line] being the one added for the line.
+        # Lines changed since are in dirty_lines, and are brought up to date by score_maps only.
+        self.point_scores = [None, [0] * 225, [0] * 225]
+        self.line_deltas = [()] * len(LINES)
+        self.dirty_lines = set(range(len(LINES)))
+        for x, column in enumerate(self.board):
+            for y, player in enumerate(column):
+                if player:
+                    self.place(x, y, player)
+
         # Record all operations
         # Format: (player, (x, y))
         self.operations = []
@@ -83,92 +269,58 @@ class ChessBoard:
             self, x: Union[int, None] = None, y: Union[int, None] = None
     ) -> int:
         """
-        Determine if there's player win in the chessboard
+        Determine if there's player win in the chessboard, in O(1) from the counters kept by place and remove
         :param x: x coordinate of last chess
         :param y: y coordinate of last chess
         :return: a integer determine who wins the game (1 for black, 2 for white, 3 for tie, and 0 for no on win)
         """
         # Tie
-        for line in self.board:
-            for each in line:
-                if each == 0:
-                    break
-            else:
-                continue
-            break
-        else:
+        if self.stones == 225:
             return TIE
 
         # Detect according to the last chess set
         if all((isinstance(x, int), isinstance(y, int))):
-            # Horizontal
-            start_x = x - 4 if x - 4 >= 0 else 0
-            end_x = x if x + 4 < 15 else 10
-            for current_x in range(start_x, end_x + 1):
-                result = self._all_same(
-                    [self.board[new_x][y] for new_x in range(current_x, current_x + 5)]
-                )
-                if result:
-                    return BLACK_WIN if self.board[x][y] == 1 else WHITE_WIN
-
-            # Vertical
-            start_y = y - 4 if y - 4 >= 0 else 0
-            end_y = y if y + 4 < 15 else 10
-            for current_y in range(start_y, end_y + 1):
-                result = self._all_same(
-                    [self.board[x][new_y] for new_y in range(current_y, current_y + 5)]
-                )
-                if result:
-                    return BLACK_WIN if self.board[x][y] == 1 else WHITE_WIN
-
-            # Diagonal
-            # Upper-left to Down-right
-            nearest_to_upper_left = min(x, y)
-            if nearest_to_upper_left < 4:
-                start_x = x - nearest_to_upper_left
-                start_y = y - nearest_to_upper_left
-            nearest_to_down_right = min(14 - x, 14 - y)
-            if nearest_to_down_right < 4:
-                end_x = x - (4 - nearest_to_down_right)
-            for index, current_x in enumerate(range(start_x, end_x + 1)):
-                current_y = start_y + index
-                result = self._all_same(
-                    [self.board[current_x + d][current_y + d] for d in range(0, 5)]
-                )
-                if result:
-                    return BLACK_WIN if self.board[x][y] == 1 else WHITE_WIN
-
-            # Down-left to Upper-right
-            nearest_to_down_left = min(x, 14 - y)
-            if nearest_to_down_left < 4:
-                start_x = x - nearest_to_down_left
-                start_y = y + nearest_to_down_left
-            else:
-                # Here need to re-calculate start x and y because they are changed previously
-                start_x = x - 4
-                start_y = y + 4
-            nearest_to_upper_right = min(14 - x, y)
-            if nearest_to_upper_right < 4:
-                end_x = x - (4 - nearest_to_upper_right)
-            else:
-                # Need to re-calculate end x as the same reason above
-                end_x = x
-            for index, current_x in enumerate(range(start_x, end_x + 1)):
-                current_y = start_y - index
-                result = self._all_same(
-                    [self.board[current_x + d][current_y - d] for d in range(0, 5)]
-                )
-                if result:
-                    return BLACK_WIN if self.board[x][y] == 1 else WHITE_WIN
-
-        else:
-            for each in self.split_board():
-                if fit_pattern(each, (1, 1, 1, 1, 1), 1):
-                    return BLACK_WIN
-                elif fit_pattern(each, (2, 2, 2, 2, 2), 2):
-                    return WHITE_WIN
+            player = self.board[x][y]
+            if player:
+                masks = self.masks[player]
+                for line, _ in CELL_LINES[x][y]:
+                    if has_five(masks[line]):
+                        return BLACK_WIN if player == 1 else WHITE_WIN
+        elif self.fives[1]:
+            return BLACK_WIN
+        elif self.fives[2]:
+            return WHITE_WIN
         return CONTINUE
 
+    def is_empty(self) -> bool:
+        """
+        :return: whether there is no chess on the board
+        """
+        return not self.stones
+
+    def has_neighbor(self, x: int, y: int, distance: int) -> bool:
+        """
+        Determine whether there is any chess in the square of the given distance around a point
+        :param x: x coordinate
+        :param y: y coordinate
+        :param distance: max distance to the point
+        :return: whether the point has a filled neighbor
+        """
+        if distance == 1 or distance == 2:
+            index = x * 15 + y
+            return bool(self.near[distance][index] or self.cells[index])
+        black, white = self.masks[1], self.masks[2]
+        low = y - distance if y - distance >= 0 else 0
+        high = y + distance if y + distance <= 14 else 14
+        window = ((1 << (high - low + 1)) - 1) << low
+        for row in range(
+                x - distance if x - distance >= 0 else 0,
+                x + distance + 1 if x + distance <= 14 else 15,
+        ):
+            if (black[row] | white[row]) & window:
+                return True
+        return False
+
     def get_board(self):
         return copy.copy(self.board)
 
@@ -177,7 +329,114 @@ class ChessBoard:
         This function is used to calculate winning possibilities
         :return: Chessboard instance with initial data of current board.
         """
-        return ChessBoard(self.mode[0], self.mode[1], data=self.board)
+        return ChessBoard(
+            self.mode[0], self.mode[1], data=[column[:] for column in self.board]
+        )
+
+    def make(self, x: int, y: int, player: int):
+        """
+        Make a move of the search: put a chess without any check or record in operations.
+        All the derived state (hash, evaluation, frontier, win status) follows, and unmake takes it back.
+        :param x: x coordinate
+        :param y: y coordinate
+        :param player: 1 for black and 2 for white
+        """
+        self.place(x, y, player)
+        self.undo_stack.append((x, y))
+
+    def unmake(self):
+        """
+        Take back the last move set by make
+        """
+        x, y = self.undo_stack.pop()
+        self.remove(x, y)
+
+    def place(self, x: int, y: int, player: int):
+        """
+        Put a chess of player on the board without any check or record, used by search
+        :param x: x coordinate
+        :param y: y coordinate
+        :param player: 1 for black and 2 for white
+        """
+        self.board[x][y] = player
+        index = x * 15 + y
+        self.cells[index] = player
+        self.hash ^= ZOBRIST[player][x][y]
+        near1, near2 = self.near[1], self.near[2]
+        for near in NEAR[1][index]:
+            near1[near] += 1
+        cells, frontier = self.cells, self.frontier
+        for near in NEAR[2][index]:
+            near2[near] += 1
+            if not cells[near]:
+                frontier.add(near)
+        frontier.discard(index)
+        self.stones += 1
+        masks = self.masks[player]
+        for line, bit in CELL_LINES[x][y]:
+            mask = masks[line]
+            # A chess can only make a five in a line which has none yet
+            if not has_five(mask) and has_five(mask | bit):
+                self.fives[player] += 1
+            masks[line] = mask | bit
+            self._rescore(line)
+
+    def remove(self, x: int, y: int):
+        """
+        Take the chess at (x, y) away from the board without any check or record, used by search
+        :param x: x coordinate
+        :param y: y coordinate
+        """
+        player = self.board[x][y]
+        self.board[x][y] = 0
+        index = x * 15 + y
+        self.cells[index] = 0
+        self.hash ^= ZOBRIST[player][x][y]
+        near1, near2 = self.near[1], self.near[2]
+        for near in NEAR[1][index]:
+            near1[near] -= 1
+        frontier = self.frontier
+        for near in NEAR[2][index]:
+            near2[near] -= 1
+            if not near2[near]:
+                frontier.discard(near)
+        if near2[index]:
+            frontier.add(index)
+        self.stones -= 1
+        masks = self.masks[player]
+        for line, bit in CELL_LINES[x][y]:
+            mask = masks[line]
+            if has_five(mask) and not has_five(mask & ~bit):
+                self.fives[player] -= 1
+            masks[line] = mask & ~bit
+            self._rescore(line)
+
+    def _rescore(self, line: int):
+        """
+        Update the cached score of a changed line and the total scores
+        """
+        old = self.line_scores[line]
+        new = line_score(LINE_LENGTHS[line], self.masks[1][line], self.masks[2][line])
+        self.line_scores[line] = new
+        scores = self.scores
+        scores[1] += new[1] - old[1]
+        scores[2] += new[2] - old[2]
+        self.dirty_lines.add(line)
+
+    def rescore(self):
+        """
+        Score every line again, after the evaluation profile is changed by use_profile
+        """
+        for line in range(len(LINES)):
+            self._rescore(line)
+
+    def score(self, player: int) -> int:
+        """
+        Evaluate the situation on chessboard for one player in O(1), using the incremental evaluation
+        :param player: 1 for black and 2 for white
+        :return: the same as self.evaluate(player, list(self.split_board()))
+        """
+        return self.scores[player]
 
     def set_chess(self, x: int, y: int, reset: bool = False):
         """
@@ -188,13 +447,13 @@ class ChessBoard:
         :return:
         """
         # Check input
-        if x not in range(self.size[0]):
+        if not 0 <= x < self.size[0]:
             raise ValueError(
                 "X coordinate should be in range 0~{}, {} given!".format(
                     self.size[0], x
                 )
             )
-        if y not in range(self.size[1]):
+        if not 0 <= y < self.size[1]:
             raise ValueError(
                 "Y coordinate should be in range 0~{}, {} given!".format(
                     self.size[1], y
@@ -204,9 +463,12 @@ class ChessBoard:
         # Add operation to recorder
         self.operations.append((self.next_turn, (x, y)))
         if reset:
-            self.board[x][y] = 0
+            if self.board[x][y]:
+                self.remove(x, y)
         else:
-            self.board[x][y] = self.next_turn
+            if self.board[x][y]:
+                self.remove(x, y)
+            self.place(x, y, self.next_turn)
             # Switch the value of self.next_turn from 1 to 2 or vise versa
             self.next_turn = 1 if self.next_turn == 2 else 2
         return self.win_determine(x, y)
@@ -227,47 +489,66 @@ class ChessBoard:
                     )
                 )
             withdraw_item = self.operations.pop()
-            self.set_chess(withdraw_item[1][0], withdraw_item[1][1], reset=True)
+            # Not through set_chess, which would record the withdraw as a new operation
+            x, y = withdraw_item[1]
+            if self.board[x][y]:
+                self.remove(x, y)
             yield withdraw_item
 
-    @staticmethod
-    def _all_same(lst: list) -> bool:
+    def line_values(self, line: int) -> list:
+        """
+        Extract one line of the board from the bitboards
+        :param line: index of the line in LINES
+        :return: list of 0 (empty), 1 (black) and 2 (white)
+        """
+        black, white = self.masks[1][line], self.masks[2][line]
+        return [
+            (black >> pos & 1) | (white >> pos & 1) << 1
+            for pos in range(LINE_LENGTHS[line])
+        ]
+
+    def score_maps(self, player: int) -> Tuple[list, list]:
         """
-        Determine is all the elements in the given iterable is same(despite the condition of all 0)
-        :return: if there is player win
+        Score all the empty cells for both players at once.
+        The scores are cached, only the lines changed since the last call are scored again.
+        :param player: the player to attack, 1 for black and 2 for white
+        :return: (attack, defence) lists indexed by x * 15 + y,
+        evaluate_point of each empty cell for the player and for the opponent, 0 for filled cells.
+        They are the cache of the board, so they must not be modified, and change with the board.
         """
-        first = lst[0]
-        if first == 0:
-            return False
-        for item in lst[1:]:
-            if item != first:
-                return False
-        return True
+        black_map, white_map = self.point_scores[1], self.point_scores[2]
+        black, white = self.masks[1], self.masks[2]
+        for line in self.dirty_lines:
+            old = self.line_deltas[line]
+            new = line_deltas(
+                LINE_LENGTHS[line], black[line], white[line], POINT_REVERSED[line]
+            )
+            # A line set back as it was by remove gives the same cached deltas
+            if new is old:
+                continue
+            indices = LINE_INDICES[line]
+            for pos, black_delta, white_delta in old:
+                black_map[indices[pos]] -= black_delta
+                white_map[indices[pos]] -= white_delta
+            for pos, black_delta, white_delta in new:
+                black_map[indices[pos]] += black_delta
+                white_map[indices[pos]] += white_delta
+            self.line_deltas[line] = new
+        self.dirty_lines.clear()
+        if player == 1:
+            return black_map, white_map
+        return white_map, black_map
 
     def split_board(self):
         """
-        This generator split board vertically, horizontally and diagonally into one-dimension arrays
+        This generator split board vertically, horizontally and diagonally into one-dimension arrays.
+        Lines without any chess are skipped, since no pattern can fit them.
         :return: Yield all split arrays one by one
         """
-        new_board = self.get_board()
-        yield from self.board[:]
-        for index, _ in enumerate(self.board[:]):
-            yield [new_board[x][index] for x in range(15)]
-        # Diagonal
-        for base in range(29):
-            yield [
-                new_board[x][base - x]
-                for x in range(
-                    0 if base <= 14 else base - 14, base + 1 if base <= 14 else 15
-                )
-            ]
-        for diff in range(-14, 15):
-            yield [
-                new_board[x][x + diff]
-                for x in range(
-                    abs(diff) if diff < 0 else 0, 15 if diff < 0 else 15 - diff
-                )
-            ]
+        black, white = self.masks[1], self.masks[2]
+        for line in range(len(LINES)):
+            if black[line] | white[line]:
+                yield self.line_values(line)
 
     # Evaluate part
     @staticmethod
@@ -280,13 +561,7 @@ class ChessBoard:
         """
         score = 0
         for line in split_board:
-            for pattern in PATTERNS.keys():
-                all_pattern = PATTERNS[pattern][player]
-                # print(all_pattern)
-                for each in all_pattern:
-                    # print("    " + str(each))
-                    score += STANDARDS[pattern] * fit_pattern(line, each, player)
-        # print(time.time() - t)
+            score += _TABLE.score_line(line, player)
         return score
 
     @staticmethod
@@ -298,6 +573,7 @@ class ChessBoard:
         :param player: coordinate of the point
         :return: score of the point
         """
+        return evaluate_point_buffer(board.buffer, point[0], point[1], player, _TABLE)
 
     def __repr__(self):
         """
@@ -317,7 +593,4 @@ class ChessBoard:
         return out
 
     def __hash__(self):
-        temp = []
-        for each in self.board:
-            temp.append(tuple(each))
-        return hash(tuple(temp))
+        return self.hash
@@ -0,0 +1,172 @@
+"""
+Opening book: best positions of the first moves, found by deep offline search.
+The book is a binary file of records sorted by the Zobrist hash of the position, read through mmap,
+so that opening it costs no loading time and a lookup is a binary search in the file.
+Run this file to build a book: python book.py [path] [plies] [width] [depth]
+"""
+import mmap
+import os
+import struct
+import sys
+import time
+from typing import Tuple, Union
+
+from board import ChessBoard
+from constants import *
+
+MAGIC = b"GOBANGBK"
+HEADER = struct.Struct("<8sI")  # magic, number of records
+RECORD = struct.Struct("<QBB")  # hash of the position, x, y of the best position
+
+
+def default_path() -> str:
+    """
+    :return: path of the book used by the ai, BOOK_PATH relative to this directory
+    """
+    return os.path.join(os.path.dirname(os.path.abspath(__file__)), BOOK_PATH)
+
+
+def _symmetries(x: int, y: int) -> list:
+    """
+    :return: the 8 images of (x, y) by the rotations and reflections of the board, in a fixed order
+    """
+    return [
+        (x, y), (y, 14 - x), (14 - x, 14 - y), (14 - y, x),
+        (y, x), (14 - x, y), (14 - y, 14 - x), (x, 14 - y),
+    ]
+
+
+class OpeningBook:
+    """
+    Read-only opening book mapped in memory
+    """
+
+    def __init__(self, path: str):
+        """
+        :param path: path of a book written by write_book
+        """
+        with open(path, "rb") as file:
+            self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self._map) < HEADER.size:
+            self._map.close()
+            raise ValueError("{} is not an opening book!".format(path))
+        magic, self.size = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or len(self._map) != HEADER.size + self.size * RECORD.size:
+            self._map.close()
+            raise ValueError("{} is not an opening book!".format(path))
+
+    @classmethod
+    def load(cls, path: str = None) -> Union["OpeningBook", None]:
+        """
+        :param path: path of the book, default_path() by default
+        :return: the book, or None if there is no book file
+        """
+        path = path or default_path()
+        if not os.path.exists(path):
+            return None
+        return cls(path)
+
+    def __len__(self):
+        return self.size
+
+    def lookup(self, board: ChessBoard) -> Union[Tuple[int, int], None]:
+        """
+        :param board: chessboard, the player to move is known by the number of chess on it
+        :return: the best position of the book, or None if the position is not in the book
+        """
+        low, high = 0, self.size
+        while low < high:
+            middle = (low + high) // 2
+            key, x, y = RECORD.unpack_from(self._map, HEADER.size + middle * RECORD.size)
+            if key == board.hash:
+                # Hash collisions with positions of the book are not excluded, so check the position
+                return (x, y) if board.board[x][y] == 0 else None
+            if key < board.hash:
+                low = middle + 1
+            else:
+                high = middle
+        return None
+
+    def close(self):
+        self._map.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def write_book(path: str, entries: dict):
+    """
+    :param path: path of the book file
+    :param entries: hash of the position -> (x, y) of the best position
+    """
+    with open(path, "wb") as file:
+        file.write(HEADER.pack(MAGIC, len(entries)))
+        for key in sorted(entries):
+            file.write(RECORD.pack(key, *entries[key]))
+
+
+def build_book(plies: int, width: int, depth: int) -> dict:
+    """
+    Search the best position of every position of the opening tree.
+    The tree has the empty board as root, and the best `width` positions given by points_gen as children of each node.
+    Every position is also stored under its 7 symmetric positions.
+    :param plies: number of chess of the deepest positions of the tree
+    :param width: number of children of a position
+    :param depth: depth of the search of each position
+    :return: entries for write_book
+    """
+    # ai.py reads the book, so it is only needed here
+    import ai
+
+    entries = {}
+    level = [[]]
+    for ply in range(plies + 1):
+        next_level = []
+        for moves in level:
+            board = ChessBoard("c", "c")
+            for x, y in moves:
+                board.set_chess(x, y)
+            player = board.next_turn
+            if board.hash in entries:
+                continue
+            if board.is_empty():
+                best = (7, 7)
+            else:
+                best = ai.min_max_search(
+                    board, player, ai.NullBar(), depth, use_book=False
+                )
+            # The same position turned or reflected has the best position turned or reflected the same way
+            images = [_symmetries(x, y) for x, y in moves]
+            best_images = _symmetries(*best)
+            for n in range(8):
+                image = ChessBoard("c", "c")
+                for chess in images:
+                    image.set_chess(*chess[n])
+                entries.setdefault(image.hash, best_images[n])
+            if ply < plies:
+                children = [best] + [
+                    point for point in ai.points_gen(board, player) if point != best
+                ]
+                next_level += [moves + [point] for point in children[:width]]
+        level = next_level
+    return entries
+
+
+if __name__ == "__main__":
+    book_path = sys.argv[1] if len(sys.argv) > 1 else default_path()
+    start_time = time.time()
+    book_entries = build_book(
+        int(sys.argv[2]) if len(sys.argv) > 2 else 4,
+        int(sys.argv[3]) if len(sys.argv) > 3 else 3,
+        int(sys.argv[4]) if len(sys.argv) > 4 else 4,
+    )
+    write_book(book_path, book_entries)
+    print(
+        "{} positions written to {} in {:.1f}s".format(
+            len(book_entries), book_path, time.time() - start_time
+        ),
+        file=sys.stderr,
+    )
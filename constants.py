@@ -3,6 +3,51 @@ WHITE_WIN = 10031
 TIE = 10032
 CONTINUE = 10033
 
+# Seed of the Zobrist keys, fixed so that position hashes are the same in every process
+ZOBRIST_SEED = 20190128
+# Memory budget of the search transposition table, in megabytes
+TT_SIZE_MB = 64
+# Depth and time budget (seconds) of the ai in the GUI
+AI_DEPTH = 2
+AI_TIME_LIMIT = 10
+# How often the GUI checks the ai running in the background (milliseconds),
+# and the min interval between two progress updates sent by the ai (seconds)
+AI_POLL_INTERVAL = 50
+AI_PROGRESS_INTERVAL = 0.1
+# How often a parallel search checks its time limit and stop event while waiting for the workers (seconds)
+PARALLEL_POLL_INTERVAL = 0.02
+# Whether the ai searches the likely replies while waiting for the opponent, and how many replies it searches
+AI_PONDER = True
+PONDER_REPLIES = 3
+# Threat space search before the full search: max fours of VCF, max threats of VCT, and max moves tried
+THREAT_SEARCH = True
+VCF_DEPTH = 10
+VCT_DEPTH = 4
+THREAT_NODES = 5000
+# Share of the time limit of a search the threat space search may use
+THREAT_TIME_SHARE = 0.3
+# Half width of the aspiration window of the root search around the score of the last iteration
+ASPIRATION_WINDOW = 500
+# Number of killer moves kept for each depth of the search
+KILLER_MOVES = 2
+# Transposition table of each side and number of random opening chess of the games of arena.py
+ARENA_TT_SIZE_MB = 16
+ARENA_OPENING_STONES = 2
+# File the GUI appends the statistics of every search to as JSON lines, None to collect no statistics,
+# whether to also sample the call stack of the search, and the seconds between two samples
+SEARCH_STATS_FILE = None
+SEARCH_PROFILE = False
+PROFILE_INTERVAL = 0.001
+# Opening book file, relative to the directory of the program
+BOOK_PATH = "opening.book"
+# Max number of line contents whose scores are cached by the incremental evaluation
+LINE_CACHE_SIZE = 1 << 18
+# Engine of gomocup.py: max depth of a search, number of moves the time left of the match is shared out to,
+# and seconds kept in reserve on every move for the protocol and the process
+GOMOCUP_MAX_DEPTH = 12
+GOMOCUP_MOVES_LEFT = 25
+GOMOCUP_MARGIN = 0.1
+
 STANDARDS = {
     "5+": 10000000,  # live 5
     "4+": 100000,  # live 4
@@ -13,6 +58,21 @@ STANDARDS = {
     "3-": 100,  # dead 3
     "2-": 10,  # dead 2
 }
+# Evaluation profiles: name -> standards used instead of STANDARDS, see board.use_profile.
+# "alternative" maps the weights of STANDARDS_ below onto the pattern types of PATTERNS.
+PROFILES = {
+    "default": STANDARDS,
+    "alternative": {
+        "5+": 10000000,
+        "4+": 300000,
+        "3+": 3000,
+        "2+": 650,
+        "1+": 10,
+        "4-": 2600,
+        "3-": 600,
+        "2-": 200,
+    },
+}
 # Store all patterns
 # Usage: patterns[type][player] -> List[tuple]
 PATTERNS = {
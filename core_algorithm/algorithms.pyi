@@ -1,9 +1,39 @@
 from board import ChessBoard
 
 
+class PatternTable:
+    def __init__(self, patterns: dict = ..., standards: dict = ...): ...
+
+    def score_line(self, sequence: list, player: int) -> int: ...
+
+    def score_deltas(self, sequence: list, player: int) -> list: ...
+
+
+DEFAULT_TABLE: PatternTable
+
+
+def score_line(sequence: list, player: int) -> int: ...
+
+
+def score_deltas(sequence: list, player: int) -> list: ...
+
+
 def fit_pattern(
         sequence: list, pattern: tuple, main_player: int, margin_effect: bool = True
 ) -> int: ...
 
 
 def evaluate_point(board: ChessBoard, point: tuple, player: int) -> int: ...
+
+
+def evaluate_buffer(board: memoryview, player: int, table: PatternTable = ...) -> int: ...
+
+
+def evaluate_point_buffer(
+        board: memoryview, x: int, y: int, player: int, table: PatternTable = ...
+) -> int: ...
+
+
+def evaluate_buffers(
+        boards: memoryview, player: int, out: memoryview, table: PatternTable = ...
+) -> None: ...
@@ -1,5 +1,176 @@
 from constants import PATTERNS, STANDARDS
 
+cdef enum:
+    MAX_LINE_LENGTH = 15
+    MAX_PATTERN_LENGTH = 8
+    MAX_CODE = 6561  # 3 ** MAX_PATTERN_LENGTH
+
+# POWERS[n] = 3 ** n
+cdef int POWERS[MAX_PATTERN_LENGTH + 1]
+POWERS[0] = 1
+for _n in range(1, MAX_PATTERN_LENGTH + 1):
+    POWERS[_n] = POWERS[_n - 1] * 3
+
+
+cdef class PatternTable:
+    """
+    Patterns and their scores compiled into lookup tables.
+    A window of k cells is encoded as a base-3 integer (cell values as digits, first cell most significant),
+    scores[player][k][code] is the total score of the player's patterns of length k equal to the window.
+    """
+    cdef long long scores[3][MAX_PATTERN_LENGTH + 1][MAX_CODE]
+    cdef int lengths[3][MAX_PATTERN_LENGTH + 1]
+    cdef int length_count[3]
+
+    def __init__(self, dict patterns = PATTERNS, dict standards = STANDARDS):
+        """
+        :param patterns: patterns[type][player] -> List[tuple], like constants.PATTERNS
+        :param standards: score of each pattern type, like constants.STANDARDS
+        """
+        cdef int player, k, code, value
+        cdef set used
+        for player in range(1, 3):
+            used = set()
+            for pattern_type in patterns:
+                for pattern in patterns[pattern_type][player]:
+                    k = len(pattern)
+                    if k > MAX_PATTERN_LENGTH:
+                        raise ValueError(
+                            "Pattern longer than {} is not supported, {} given!".format(
+                                MAX_PATTERN_LENGTH, pattern
+                            )
+                        )
+                    code = 0
+                    for value in pattern:
+                        code = code * 3 + value
+                    self.scores[player][k][code] += standards[pattern_type]
+                    used.add(k)
+            self.length_count[player] = len(used)
+            for index, k in enumerate(sorted(used)):
+                self.lengths[player][index] = k
+
+    cdef long long score_cells(self, const int* line, int length, int player) nogil:
+        """
+        Score one line the same way as adding up STANDARDS * fit_pattern of every pattern:
+        the line is scanned with the opponent as a border before its first cell, and its last cell is left out.
+        """
+        cdef int padded[MAX_LINE_LENGTH]
+        cdef int i, k, start, code, high
+        cdef long long total = 0
+        cdef long long* table
+        padded[0] = 1 if player == 2 else 2
+        for i in range(1, length):
+            padded[i] = line[i - 1]
+        for i in range(self.length_count[player]):
+            k = self.lengths[player][i]
+            if length <= k:
+                continue
+            table = self.scores[player][k]
+            high = POWERS[k - 1]
+            code = 0
+            for start in range(k):
+                code = code * 3 + padded[start]
+            total += table[code]
+            for start in range(1, length - k + 1):
+                code = (code - padded[start - 1] * high) * 3 + padded[start + k - 1]
+                total += table[code]
+        return total
+
+    def score_line(self, list sequence, int player):
+        """
+        Score one line for a player, equal to ChessBoard.evaluate(player, [sequence])
+        :param sequence: the line, at most 15 cells
+        :param player: 1 for black and 2 for white
+        :return: score of the line
+        """
+        cdef int line[MAX_LINE_LENGTH]
+        cdef int length = copy_line(sequence, line)
+        check_player(player)
+        return self.score_cells(line, length, player)
+
+    def score_deltas(self, list sequence, int player):
+        """
+        Score every empty cell of a line for a player: how much the score of the line raises if the player sets there
+        :param sequence: the line, at most 15 cells
+        :param player: 1 for black and 2 for white
+        :return: list of the raise of every cell, 0 for filled cells
+        """
+        cdef int line[MAX_LINE_LENGTH]
+        cdef int length = copy_line(sequence, line)
+        cdef int i
+        cdef long long base
+        check_player(player)
+        base = self.score_cells(line, length, player)
+        deltas = [0] * length
+        for i in range(length):
+            if line[i] == 0:
+                line[i] = player
+                deltas[i] = self.score_cells(line, length, player) - base
+                line[i] = 0
+        return deltas
+
+
+cdef int copy_line(list sequence, int* line) except -1:
+    """
+    Copy a line into a C array of MAX_LINE_LENGTH cells, checking its length and cells
+    :return: length of the line
+    """
+    cdef int i, value
+    cdef int length = len(sequence)
+    if length > MAX_LINE_LENGTH:
+        raise ValueError(
+            "Sequence longer than {} is not supported, {} given!".format(MAX_LINE_LENGTH, sequence)
+        )
+    for i in range(length):
+        value = sequence[i]
+        if not 0 <= value <= 2:
+            raise ValueError("Cell must be 0, 1 or 2, {} given!".format(value))
+        line[i] = value
+    return length
+
+
+cdef check_player(int player):
+    if player != 1 and player != 2:
+        raise ValueError("Player must be 1 or 2, {} given!".format(player))
+
+
+DEFAULT_TABLE = PatternTable()
+
+
+def score_line(list sequence, int player):
+    """
+    Score one line for a player with the default patterns
+    :param sequence: the line, at most 15 cells
+    :param player: 1 for black and 2 for white
+    :return: score of the line
+    """
+    return DEFAULT_TABLE.score_line(sequence, player)
+
+
+def score_deltas(list sequence, int player):
+    """
+    Score every empty cell of a line for a player with the default patterns
+    :param sequence: the line, at most 15 cells
+    :param player: 1 for black and 2 for white
+    :return: list of the raise of the line score if the player sets on each cell, 0 for filled cells
+    """
+    return DEFAULT_TABLE.score_deltas(sequence, player)
+
+cdef int count_windows(const int* sequence, const int* pattern, int sub_length, int windows) nogil:
+    """
+    :return: the number of the first `windows` windows of sequence equal to pattern
+    """
+    cdef int start, i
+    cdef int count = 0
+    for start in range(windows):
+        for i in range(sub_length):
+            if sequence[start + i] != pattern[i]:
+                break
+        else:
+            count += 1
+    return count
+
+
 def fit_pattern(list sequence, tuple pattern, int main_player, margin_effect = True):
     """
     Find the number of patterns appear in sequence
@@ -11,25 +182,123 @@ def fit_pattern(list sequence, tuple pattern, int main_player, margin_effect = T
     """
     cdef int main_length = len(sequence)
     cdef int sub_length = len(pattern)
+    cdef int cells[MAX_LINE_LENGTH + 2]
+    cdef int pattern_cells[MAX_LINE_LENGTH + 2]
+    cdef int padded_length = main_length + 2 if margin_effect else main_length
+    cdef int i, offset, add_player, count
+
+    if main_length > MAX_LINE_LENGTH or sub_length > MAX_LINE_LENGTH + 2:
+        raise ValueError(
+            "Sequence longer than {} is not supported, {} given!".format(MAX_LINE_LENGTH, sequence)
+        )
+    if main_length < sub_length:
+        return 0
 
-    sequence = sequence[:]
-    cdef int add_player
-    cdef int count
+    # The sequence with the margins as the opponent's chess, and the pattern, as C arrays
+    offset = 0
     if margin_effect:
         add_player = 1 if main_player == 2 else 2
-        sequence.insert(0, add_player)
-        sequence.append(add_player)
+        cells[0] = add_player
+        cells[padded_length - 1] = add_player
+        offset = 1
+    for i in range(main_length):
+        cells[offset + i] = sequence[i]
+    for i in range(sub_length):
+        pattern_cells[i] = pattern[i]
 
-    if main_length < sub_length:
-        return 0
-    elif main_length == sub_length:
-        return 1 if sequence == list(pattern) else 0
-    else:
-        count = 0
-        for start in range(main_length - sub_length + 1):
-            if sequence[start: start + sub_length] == list(pattern):
-                count += 1
-        return count
+    if main_length == sub_length:
+        if padded_length != sub_length:
+            return 0
+        return count_windows(cells, pattern_cells, sub_length, 1)
+    with nogil:
+        count = count_windows(cells, pattern_cells, sub_length, main_length - sub_length + 1)
+    return count
+
+
+cdef long long board_score(PatternTable table, const signed char* cells, int player) nogil:
+    """
+    Score a whole board for a player, the same as ChessBoard.evaluate on its split_board
+    :param cells: the board, cell (x, y) at x * 15 + y
+    """
+    cdef int line[MAX_LINE_LENGTH]
+    cdef int i, x, y, base, low, length, filled
+    cdef long long total = 0
+    # Rows and columns
+    for x in range(15):
+        filled = 0
+        for i in range(15):
+            line[i] = cells[x * 15 + i]
+            filled |= line[i]
+        if filled:
+            total += table.score_cells(line, 15, player)
+    for y in range(15):
+        filled = 0
+        for i in range(15):
+            line[i] = cells[i * 15 + y]
+            filled |= line[i]
+        if filled:
+            total += table.score_cells(line, 15, player)
+    # Anti-diagonals (x + y fixed) and diagonals (y - x fixed), x ascending like board.LINES
+    for base in range(29):
+        low = base - 14 if base > 14 else 0
+        length = (base if base < 14 else 14) - low + 1
+        filled = 0
+        for i in range(length):
+            line[i] = cells[(low + i) * 15 + base - low - i]
+            filled |= line[i]
+        if filled:
+            total += table.score_cells(line, length, player)
+    for base in range(-14, 15):
+        low = -base if base < 0 else 0
+        length = 15 - (base if base > 0 else -base)
+        filled = 0
+        for i in range(length):
+            line[i] = cells[(low + i) * 15 + low + i + base]
+            filled |= line[i]
+        if filled:
+            total += table.score_cells(line, length, player)
+    return total
+
+
+cdef long long point_score(PatternTable table, const signed char* cells, int x, int y, int player) nogil:
+    """
+    Score the raise of the lines through an empty point if the player sets there, like evaluate_point
+    :param cells: the board, cell (x, y) at x * 15 + y
+    """
+    cdef int line[MAX_LINE_LENGTH]
+    cdef int direction, length, index, i, to_margin
+    cdef long long ori_score = 0
+    cdef long long new_score = 0
+
+    # The four lines through the point: horizontal, vertical, diagonal, and the other diagonal read from bottom
+    for direction in range(4):
+        if direction == 0:
+            length = 15
+            for i in range(15):
+                line[i] = cells[x * 15 + i]
+            index = y
+        elif direction == 1:
+            length = 15
+            for i in range(15):
+                line[i] = cells[i * 15 + y]
+            index = x
+        elif direction == 2:
+            to_margin = min(x, y)
+            length = 15 - abs(x - y)
+            for i in range(length):
+                line[i] = cells[(x - to_margin + i) * 15 + y - to_margin + i]
+            index = to_margin
+        else:
+            to_margin = min(14 - x, y)
+            length = 15 - abs(14 - x - y)
+            for i in range(length):
+                line[i] = cells[(x + to_margin - i) * 15 + y - to_margin + i]
+            index = to_margin
+        ori_score += table.score_cells(line, length, player)
+        line[index] = player
+        new_score += table.score_cells(line, length, player)
+
+    return new_score - ori_score
 
 
 def evaluate_point(board, tuple point, int player):
@@ -41,75 +310,86 @@ def evaluate_point(board, tuple point, int player):
     :return: Score of the point
     """
     assert board.board[point[0]][point[1]] == 0
+    check_player(player)
 
-    cdef list cases = [board.board[point[0]], [board.board[x][point[1]] for x in range(15)]]
-    # Diagonal
-    cdef list diagonal = []
-    cdef int to_margin = min(point)
-    cdef tuple start = (point[0] - to_margin, point[1] - to_margin)
-    cdef int i = 0
-    cdef int t_x = start[0] + i
-    cdef int t_y = start[1] + i
-    while t_x < 15 and t_y < 15:
-        diagonal.append(board.board[t_x][t_y])
-        i += 1
-        t_x, t_y = start[0] + i, start[1] + i
-    cases.append(diagonal)
-
-    cdef list diagonal1 = []
-    cdef int to_margin1 = min(14 - point[0], point[1])
-    cdef tuple start1 = (point[0] + to_margin1, point[1] - to_margin1)
-    cdef int i1 = 0
-    cdef int t_x1 = start1[0] - i1
-    cdef int t_y1 = start1[1] + i1
-    while t_x1 >= 0 and t_y1 < 15:
-        # print(t_x1, t_y1, i1, start1, point, to_margin1)
-        diagonal1.append(board.board[t_x1][t_y1])
-        i1 += 1
-        t_x1, t_y1 = start1[0] - i1, start1[1] + i1
-    cases.append(diagonal1)
-
-    ori_score = 0
-    for case in cases:
-        for pattern in PATTERNS:
-            all_pattern = PATTERNS[pattern][player]
-            for each in all_pattern:
-                ori_score += STANDARDS[pattern] * fit_pattern(case, each, player)
-
-    board.board[point[0]][point[1]] = player
-    cases = [board.board[point[0]], [board.board[x][point[1]] for x in range(15)]]
-    # Diagonal
-    cdef list diagonal2 = []
-    cdef int to_margin2 = min(point)
-    cdef tuple start2 = (point[0] - to_margin2, point[1] - to_margin2)
-    cdef int i2 = 0
-    cdef int t_x2 = start2[0] + i2
-    cdef int t_y2 = start2[1] + i2
-    while t_x2 < 15 and t_y2 < 15:
-        diagonal2.append(board.board[t_x2][t_y2])
-        i2 += 1
-        t_x2, t_y2 = start2[0] + i2, start2[1] + i2
-    cases.append(diagonal2)
-
-    cdef list diagonal3 = []
-    cdef int to_margin3 = min(14 - point[0], point[1])
-    cdef tuple start3 = (point[0] + to_margin3, point[1] - to_margin3)
-    cdef int i3 = 0
-    cdef int t_x3 = start3[0] - i3
-    cdef int t_y3 = start3[1] + i3
-    while t_x3 >= 03 and t_y3 < 15:
-        # print(t_x3, t_y33, i3, start3, point, to_margin)
-        diagonal3.append(board.board[t_x3][t_y3])
-        i3 += 1
-        t_x3, t_y3 = start3[0] - i3, start3[1] + i3
-    cases.append(diagonal3)
-
-    new_score = 0
-    for case in cases:
-        for pattern in PATTERNS:
-            all_pattern = PATTERNS[pattern][player]
-            for each in all_pattern:
-                new_score += STANDARDS[pattern] * fit_pattern(case, each, player)
-
-    board.board[point[0]][point[1]] = 0
-    return new_score - ori_score
+    cdef const signed char[:, ::1] cells = board.buffer
+    return point_score(DEFAULT_TABLE, &cells[0, 0], point[0], point[1], player)
+
+
+def evaluate_buffer(const signed char[:, ::1] board, int player, PatternTable table = DEFAULT_TABLE):
+    """
+    Evaluate a whole board held in a buffer, without the GIL
+    :param board: contiguous int8 buffer of shape (15, 15), board[x][y] like ChessBoard.board, e.g. ChessBoard.buffer
+    :param player: 1 for black and 2 for white
+    :param table: compiled patterns
+    :return: the same as ChessBoard.evaluate(player, list(board.split_board()))
+    """
+    cdef long long score
+    check_shape(board.shape[0], board.shape[1])
+    check_player(player)
+    check_cells(&board[0, 0], 225)
+    with nogil:
+        score = board_score(table, &board[0, 0], player)
+    return score
+
+
+def evaluate_point_buffer(
+        const signed char[:, ::1] board, int x, int y, int player, PatternTable table = DEFAULT_TABLE
+):
+    """
+    Evaluate the score of an empty point of a board held in a buffer, without the GIL
+    :param board: contiguous int8 buffer of shape (15, 15), board[x][y] like ChessBoard.board
+    :param x: x coordinate of the point
+    :param y: y coordinate of the point
+    :param player: 1 for black and 2 for white
+    :param table: compiled patterns
+    :return: the same as evaluate_point
+    """
+    cdef long long score
+    check_shape(board.shape[0], board.shape[1])
+    check_player(player)
+    check_cells(&board[0, 0], 225)
+    if not (0 <= x < 15 and 0 <= y < 15) or board[x, y] != 0:
+        raise ValueError("Point must be an empty cell of the board, ({}, {}) given!".format(x, y))
+    with nogil:
+        score = point_score(table, &board[0, 0], x, y, player)
+    return score
+
+
+def evaluate_buffers(
+        const signed char[:, :, ::1] boards, int player, long long[::1] out, PatternTable table = DEFAULT_TABLE
+):
+    """
+    Evaluate many boards without the GIL, so that several threads can share the work
+    :param boards: contiguous int8 buffer of shape (N, 15, 15)
+    :param player: 1 for black and 2 for white
+    :param out: buffer of N int64, out[n] is set to evaluate_buffer of board n
+    :param table: compiled patterns
+    """
+    cdef Py_ssize_t n
+    check_player(player)
+    if boards.shape[0]:
+        check_shape(boards.shape[1], boards.shape[2])
+        check_cells(&boards[0, 0, 0], boards.shape[0] * 225)
+    if out.shape[0] != boards.shape[0]:
+        raise ValueError(
+            "Output must have one item per board, {} for {} boards given!".format(out.shape[0], boards.shape[0])
+        )
+    with nogil:
+        for n in range(boards.shape[0]):
+            out[n] = board_score(table, &boards[n, 0, 0], player)
+
+
+cdef check_shape(Py_ssize_t rows, Py_ssize_t columns):
+    if rows != 15 or columns != 15:
+        raise ValueError("Board must be of shape (15, 15), ({}, {}) given!".format(rows, columns))
+
+
+cdef check_cells(const signed char* cells, Py_ssize_t count):
+    """
+    The cells become digits of the codes indexing the score tables, so they must be 0, 1 or 2
+    """
+    cdef Py_ssize_t i
+    for i in range(count):
+        if not 0 <= cells[i] <= 2:
+            raise ValueError("Cell must be 0, 1 or 2, {} given!".format(cells[i]))
@@ -0,0 +1,210 @@
+"""
+Engine speaking the text protocol of Gomocup managers (such as piskvork) on stdin and stdout, without the GUI.
+The process is started once for a whole match, so the transposition table, the move ordering
+and the opening book are kept between moves. Run this file and give its path to the manager:
+python gomocup.py
+Supported commands: START, RESTART, BEGIN, TURN, BOARD, INFO, TAKEBACK, ABOUT and END.
+Coordinates are "x,y" as given by the manager, the board must be 15*15.
+"""
+import sys
+import time
+from typing import TextIO, Tuple
+
+import ai
+from board import ChessBoard
+from constants import *
+from transposition import TranspositionTable
+
+ABOUT = 'name="gobang", version="1.0", author="gobang", country="CN"'
+
+
+class GomocupEngine:
+    """
+    State of the engine between commands: the board, the side of the engine and the clock
+    """
+
+    def __init__(self, output: TextIO = sys.stdout):
+        """
+        :param output: stream the answers are written to
+        """
+        self.output = output
+        self.table_size_mb = TT_SIZE_MB
+        self.table = TranspositionTable(self.table_size_mb)
+        self.board = ChessBoard("c", "c")
+        # Player number of the engine, known at the first BEGIN, TURN or BOARD of a game
+        self.own = None
+        # Time controls from INFO, in milliseconds. 0 for timeout_turn means as fast as possible,
+        # 0 for timeout_match means no limit. time_left is updated by the manager, or by the engine itself
+        self.timeout_turn = 30000
+        self.timeout_match = 0
+        self.time_left = None
+        # time.time() when the current command was read, the clock of a move starts with it
+        self.received = time.time()
+
+    def send(self, text: str):
+        self.output.write(text + "\n")
+        self.output.flush()
+
+    def reset(self):
+        self.board = ChessBoard("c", "c")
+        self.own = None
+        self.time_left = None
+
+    def time_budget(self) -> float:
+        """
+        :return: seconds for the next move, from the time controls
+        """
+        budget = self.timeout_turn / 1000
+        if self.timeout_match:
+            time_left = self.timeout_match if self.time_left is None else self.time_left
+            budget = min(budget, time_left / 1000 / GOMOCUP_MOVES_LEFT)
+        return max(budget - GOMOCUP_MARGIN, 0.0)
+
+    def parse_point(self, text: str) -> Tuple[int, int]:
+        """
+        :param text: "x,y"
+        :return: (x, y), checked to be an empty cell of the board
+        """
+        try:
+            x, y = (int(value) for value in text.split(","))
+        except ValueError:
+            raise ValueError("Coordinate must be x,y, {} given!".format(text))
+        if not (0 <= x < 15 and 0 <= y < 15):
+            raise ValueError("Coordinate must be in range 0~14, {} given!".format(text))
+        if self.board.board[x][y]:
+            raise ValueError("Cell {} is not empty!".format(text))
+        return x, y
+
+    def play(self):
+        """
+        Search the move of the engine, set it on the board and send it.
+        The whole search, threat space search included, is held to the time budget counted from the command.
+        """
+        opponent = 1 if self.own == 2 else 2
+        self.board.next_turn = self.own
+        info = {}
+        position = ai.min_max_search(
+            self.board,
+            self.own,
+            ai.NullBar(),
+            GOMOCUP_MAX_DEPTH,
+            table=self.table,
+            time_limit=max(self.time_budget() - (time.time() - self.received), 0.0),
+            info=info,
+        )
+        if position is None:
+            raise ValueError("No move found for player {}!".format(self.own))
+        x, y = position
+        used_time = time.time() - self.received
+        if self.time_left is not None or self.timeout_match:
+            time_left = self.timeout_match if self.time_left is None else self.time_left
+            self.time_left = max(time_left - int(used_time * 1000), 0)
+        self.board.place(x, y, self.own)
+        self.board.next_turn = opponent
+        if info:
+            self.send(
+                "MESSAGE depth {} score {} nodes {} time {:.3f}".format(
+                    info["depth"], info["score"], info["nodes"], used_time
+                )
+            )
+        self.send("{},{}".format(x, y))
+
+    def handle(self, line: str, lines) -> bool:
+        """
+        Answer one command
+        :param line: the command line
+        :param lines: iterator of the next lines of the input, read by BOARD until DONE
+        :return: False after END, otherwise True
+        """
+        command, _, argument = line.strip().partition(" ")
+        command = command.upper()
+        argument = argument.strip()
+        if command == "START":
+            if argument != "15":
+                self.send("ERROR unsupported size {}, the board must be 15*15".format(argument))
+            else:
+                self.reset()
+                self.send("OK")
+        elif command == "RESTART":
+            self.reset()
+            self.send("OK")
+        elif command == "BEGIN":
+            self.own = 1
+            self.play()
+        elif command == "TURN":
+            point = self.parse_point(argument)
+            if self.own is None:
+                self.own = 2
+            self.board.place(point[0], point[1], 1 if self.own == 2 else 2)
+            self.play()
+        elif command == "BOARD":
+            self.board = ChessBoard("c", "c")
+            # All rows are read before any is parsed, so that an error does not leave the rest as commands
+            rows = []
+            for row in lines:
+                if row.strip().upper() == "DONE":
+                    break
+                rows.append(row.strip())
+            stones = []
+            seen = set()
+            for row in rows:
+                cell, _, field = row.rpartition(",")
+                point = self.parse_point(cell)
+                if point in seen:
+                    raise ValueError("Cell {} is given twice!".format(cell))
+                seen.add(point)
+                # Field 1 is a chess of the engine, 2 (and 3 of continuous games) of the opponent
+                stones.append((point, field == "1"))
+            # The engine is to move: it is black if both have as many chess
+            own = sum(mine for _, mine in stones)
+            self.own = 1 if own == len(stones) - own else 2
+            opponent = 1 if self.own == 2 else 2
+            for (x, y), mine in stones:
+                self.board.place(x, y, self.own if mine else opponent)
+            self.play()
+        elif command == "INFO":
+            key, _, value = argument.partition(" ")
+            if key == "timeout_turn":
+                self.timeout_turn = int(value)
+            elif key == "timeout_match":
+                self.timeout_match = int(value)
+            elif key == "time_left":
+                self.time_left = int(value)
+            elif key == "max_memory" and int(value):
+                # Half of the memory for the transposition table, the rest for Python and the caches
+                size_mb = min(max(int(value) // (2 << 20), 1), TT_SIZE_MB)
+                if size_mb != self.table_size_mb:
+                    self.table_size_mb = size_mb
+                    self.table = TranspositionTable(size_mb)
+        elif command == "TAKEBACK":
+            try:
+                x, y = (int(value) for value in argument.split(","))
+            except ValueError:
+                raise ValueError("Coordinate must be x,y, {} given!".format(argument))
+            if 0 <= x < 15 and 0 <= y < 15 and self.board.board[x][y]:
+                self.board.remove(x, y)
+            self.send("OK")
+        elif command == "ABOUT":
+            self.send(ABOUT)
+        elif command == "END":
+            return False
+        elif command:
+            self.send("UNKNOWN command {}".format(command))
+        return True
+
+    def run(self, source: TextIO = sys.stdin):
+        """
+        Answer the commands of source until END or the end of the input
+        """
+        lines = iter(source.readline, "")
+        for line in lines:
+            self.received = time.time()
+            try:
+                if not self.handle(line, lines):
+                    break
+            except ValueError as error:
+                self.send("ERROR {}".format(error))
+
+
+if __name__ == "__main__":
+    GomocupEngine().run()
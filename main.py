@@ -1,3 +1,6 @@
+import queue
+import sys
+import threading
 import time
 from collections import namedtuple
 from tkinter import *
@@ -7,6 +10,8 @@ from typing import Tuple, Union
 from ai import min_max_search, points_gen
 from board import ChessBoard, format_number
 from constants import *
+from ponder import Ponderer
+from stats import SearchStats
 
 sys.setrecursionlimit(100000)
 
@@ -20,6 +25,14 @@ class ChessBoardInterface:
 
         self.button_freeze = False
 
+        # Ai running in a worker thread: event to cancel it, queue of its messages and its progress bar
+        self.ai_stop = None
+        self.ai_messages = None
+        self.ai_bar = None
+        self.ai_start_time = 0
+        # Searches the replies of the human while waiting
+        self.ponderer = Ponderer()
+
         # Total chessboard
         self.boardFrame = Frame(self.root)
 
@@ -80,28 +93,107 @@ class ChessBoardInterface:
 
     def ai_calculate(self):
         """
-        Call min_max search in ai.py to find the best place to set chess
+        Call min_max search in ai.py in a worker thread to find the best place to set chess
         """
         if self.button_freeze:
             return
         print("Perform AI Evaluate!", end=" ")
-        start_time = time.time()
+        self.ai_start_time = time.time()
+
+        # Answer at once if the move of the human was searched while waiting
+        position = self.ponderer.take(self.chessBoard, self.chessBoard.next_turn)
+        if position is not None:
+            print("(pondered)", end=" ")
+            self._ai_move(position)
+            return
+
         self.chessBoard.freeze = True
         self.button_freeze = True
 
-        bar = Bar(len(points_gen(self.chessBoard, self.chessBoard.next_turn)))
-        position = min_max_search(
-            self.chessBoard, self.chessBoard.next_turn, bar, depth=2
+        self.ai_stop = threading.Event()
+        self.ai_messages = queue.Queue()
+        # The root positions are searched once in every iteration of the iterative deepening
+        self.ai_bar = Bar(
+            len(points_gen(self.chessBoard, self.chessBoard.next_turn)) * (AI_DEPTH + 1),
+            cancel=self.ai_stop.set,
         )
+        threading.Thread(
+            target=self._ai_worker,
+            args=(
+                self.chessBoard.copy_board(),
+                self.chessBoard.next_turn,
+                self.ai_messages,
+                self.ai_stop,
+            ),
+            daemon=True,
+        ).start()
+        self.root.after(AI_POLL_INTERVAL, self._poll_ai)
 
-        print(position)
-        position = self.convert_coordinate(position[0], position[1])
-        temp_coo = namedtuple("Coordinate", ["x", "y"])
-        print("Used time: {}".format(round(time.time() - start_time, 3)))
+    @staticmethod
+    def _ai_worker(
+            board: ChessBoard, ai_num: int, messages: queue.Queue, stop: threading.Event
+    ):
+        """
+        Run the search in the worker thread, and put ("done", position) into messages at the end
+        """
+        position = None
+        stats = SearchStats(SEARCH_PROFILE) if SEARCH_STATS_FILE else None
+        try:
+            position = min_max_search(
+                board,
+                ai_num,
+                QueueBar(messages),
+                depth=AI_DEPTH,
+                time_limit=AI_TIME_LIMIT,
+                stop=stop,
+                stats=stats,
+            )
+            if stats is not None and stats.seconds:
+                stats.dump(SEARCH_STATS_FILE)
+        finally:
+            messages.put(("done", position))
+
+    def _poll_ai(self):
+        """
+        Show the progress of the ai, and set its chess once it finishes
+        """
+        done = False
+        position = None
+        try:
+            while True:
+                kind, value = self.ai_messages.get_nowait()
+                if kind == "progress":
+                    self.ai_bar.step_in(value)
+                else:
+                    done = True
+                    position = value
+        except queue.Empty:
+            pass
+        if not done:
+            self.root.after(AI_POLL_INTERVAL, self._poll_ai)
+            return
 
+        self.ai_bar.exit()
         self.chessBoard.freeze = False
         self.button_freeze = False
+        if position is None:
+            print("Cancelled")
+            return
+
+        self._ai_move(position)
+
+    def _ai_move(self, position: Tuple[int, int]):
+        """
+        Set the chess found by the ai, then ponder on the replies of the human
+        """
+        ai_num = self.chessBoard.next_turn
+        print(position)
+        position = self.convert_coordinate(position[0], position[1])
+        temp_coo = namedtuple("Coordinate", ["x", "y"])
+        print("Used time: {}".format(round(time.time() - self.ai_start_time, 3)))
         self.mouse_click(temp_coo(position[0], position[1]))
+        if AI_PONDER and not self.chessBoard.freeze:
+            self.ponderer.start(self.chessBoard, ai_num)
 
     def button_evaluate(self):
         """
@@ -110,9 +202,8 @@ class ChessBoardInterface:
         if self.button_freeze:
             return
         print("Perform evaluate_point!")
-        split = list(self.chessBoard.split_board())
-        self.score1["text"] = "Black: {}".format(self.chessBoard.evaluate(1, split))
-        self.score2["text"] = "White: {}".format(self.chessBoard.evaluate(2, split))
+        self.score1["text"] = "Black: {}".format(self.chessBoard.score(1))
+        self.score2["text"] = "White: {}".format(self.chessBoard.score(2))
         self.root.update()
 
     def mouse_click(self, click):
@@ -233,6 +324,9 @@ class ChessBoardInterface:
 
     def restart_game(self):
         global user_info, bd
+        if self.ai_stop is not None:
+            self.ai_stop.set()
+        self.ponderer.stop()
         del bd
         print("\n----------Restart Game!----------")
         self.root.destroy()
@@ -244,6 +338,7 @@ class ChessBoardInterface:
         if self.chessBoard.freeze or self.button_freeze:
             return
 
+        self.ponderer.stop()
         withdraw_gen = self.chessBoard.withdraw()
         last_chess = next(withdraw_gen)
         player, position = last_chess
@@ -263,8 +358,12 @@ class ChessBoardInterface:
 
 
 class Bar:
-    def __init__(self, length: int):
-        self.root = Tk()
+    def __init__(self, length: int, cancel=None):
+        """
+        :param length: number of steps of the whole progress
+        :param cancel: function called by the cancel button, no button if None
+        """
+        self.root = Toplevel()
         self.root.title("Ai calculating...")
         self.root.resizable(width=FALSE, height=FALSE)
 
@@ -277,17 +376,45 @@ class Bar:
         self.time_frame = Label(self.root, text="Total time: 0s")
         self.time_frame.pack()
 
-    def step_in(self):
-        self.bar.step(1)
+        if cancel is not None:
+            Button(self.root, text="Cancel", command=cancel).pack(pady=5)
+
+    def step_in(self, steps: int = 1):
+        self.bar.step(steps)
         self.time_frame["text"] = "Total time: {}s".format(
             int(time.time() - self.start_time)
         )
-        self.root.update()
 
     def exit(self):
         self.root.destroy()
 
 
+class QueueBar:
+    """
+    Control bar of a search running in a worker thread.
+    Steps are put into a queue as ("progress", steps), at most once per AI_PROGRESS_INTERVAL seconds,
+    and shown by the GUI thread.
+    """
+
+    def __init__(self, messages: queue.Queue):
+        self.messages = messages
+        self.steps = 0
+        self.last_time = 0
+
+    def step_in(self):
+        self.steps += 1
+        now = time.time()
+        if now - self.last_time >= AI_PROGRESS_INTERVAL:
+            self.messages.put(("progress", self.steps))
+            self.steps = 0
+            self.last_time = now
+
+    def exit(self):
+        if self.steps:
+            self.messages.put(("progress", self.steps))
+            self.steps = 0
+
+
 class OkWindow:
     def __init__(self, win: Union[str, int]):
         self.final_restart = False
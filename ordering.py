@@ -0,0 +1,65 @@
+from typing import Tuple
+
+from constants import *
+
+
+class MoveOrdering:
+    """
+    History heuristic and killer moves, learned from the cutoffs of the search.
+    Both are kept between searches, so that the moves which refuted the last positions are tried first in the next ones.
+    """
+
+    def __init__(self, killers: int = KILLER_MOVES):
+        """
+        :param killers: number of killer moves kept for each depth
+        """
+        self.killer_count = killers
+        # history[player][x * 15 + y]: sum of depth * depth of the cutoffs made by this move of this player
+        self.history = [None, [0] * 225, [0] * 225]
+        # killers[depth]: last moves which made a cutoff at this remaining depth, the newest first
+        self.killers = {}
+
+    def new_search(self):
+        """
+        Age the history, so that the cutoffs of the last moves of the game count more than older ones
+        """
+        for player in (1, 2):
+            history = self.history[player]
+            for index in range(225):
+                history[index] >>= 1
+
+    def clear(self):
+        self.history = [None, [0] * 225, [0] * 225]
+        self.killers = {}
+
+    def cutoff(self, player: int, depth: int, point: Tuple[int, int]):
+        """
+        Learn a move which made a cutoff
+        :param player: player who made the move
+        :param depth: remaining depth of the search at the position
+        :param point: the move
+        """
+        self.history[player][point[0] * 15 + point[1]] += depth * depth
+        killers = self.killers.setdefault(depth, [])
+        if point in killers:
+            killers.remove(point)
+        killers.insert(0, point)
+        del killers[self.killer_count:]
+
+    def order(self, points: list, player: int, depth: int, hash_move: Tuple[int, int] = None) -> list:
+        """
+        Sort the moves of a position: the move of the transposition table, then the killer moves,
+        then the others by history score. Moves of equal history keep the order of points_gen.
+        :param points: moves from points_gen
+        :param player: player to move
+        :param depth: remaining depth of the search at the position
+        :param hash_move: best move stored in the transposition table, or None
+        :return: the sorted moves
+        """
+        history = self.history[player]
+        first = [point for point in [hash_move] + self.killers.get(depth, []) if point in points]
+        # Remove repeated moves, the hash move may also be a killer
+        first = list(dict.fromkeys(first))
+        rest = [point for point in points if point not in first]
+        rest.sort(key=lambda point: history[point[0] * 15 + point[1]], reverse=True)
+        return first + rest
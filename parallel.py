@@ -0,0 +1,225 @@
+"""
+Root-parallel search: the positions of the root of every iteration of min_max_search are searched
+by a pool of processes.
+Run this file to benchmark the scaling from 1 to N workers.
+"""
+import multiprocessing
+import os
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Tuple
+
+import ai
+from board import ChessBoard
+from constants import *
+from transposition import TranspositionTable
+
+
+# State of a worker process, set by _init_worker
+_best = None  # best root score found by all workers so far, shared between processes
+_cancel = None  # event set by the main process to stop the searches of the workers
+_table = None  # transposition table of the worker, kept between tasks
+
+
+def encode_board(board: ChessBoard) -> bytes:
+    """
+    :param board: chessboard
+    :return: 225 bytes, board.board[x][y] at index x * 15 + y
+    """
+    return bytes(cell for column in board.board for cell in column)
+
+
+def decode_board(data: bytes) -> ChessBoard:
+    """
+    :param data: result of encode_board
+    :return: chessboard with the same chess
+    """
+    return ChessBoard(
+        "c", "c", data=[list(data[x * 15: x * 15 + 15]) for x in range(15)]
+    )
+
+
+def _init_worker(best, cancel, table_size_mb: int):
+    global _best, _cancel, _table
+    _best = best
+    _cancel = cancel
+    _table = TranspositionTable(table_size_mb)
+
+
+def _search_position(
+        data: bytes, ai_num: int, point: Tuple[int, int], depth: int, deadline: float = None
+) -> Tuple[Tuple[int, int], int, int]:
+    """
+    Search one position of the root in a worker.
+    Positions which can not beat the best score of the other workers are only proven worse, not scored exactly.
+    :param deadline: time.time() after which the search is stopped by SearchTimeout, None for no limit
+    :return: (position, score, number of searched nodes)
+    """
+    board = decode_board(data)
+    board.make(point[0], point[1], ai_num)
+    _table.new_search()
+    # The bound is read again before every reply of the opponent, so that a better score found by another worker
+    # during this search still cuts it. It stays one less than the best score, so that positions as good
+    # as the best are still scored exactly
+    context = ai.SearchContext(
+        _table,
+        deadline,
+        _cancel,
+        shared_beta=lambda: 1 - _best.value,
+        shared_depth=depth,
+    )
+    alpha = max(_best.value - 1, -ai.INFINITY)
+    score = -ai.search_point(
+        board, ai_num, 1 if ai_num == 2 else 2, depth, -ai.INFINITY, -alpha, context
+    )
+    with _best.get_lock():
+        if score > _best.value:
+            _best.value = score
+    return point, score, context.nodes
+
+
+class ParallelSearch:
+    """
+    Pool of worker processes searching the positions of the root at the same time.
+    It is given to min_max_search as its pool, which keeps the opening book, the threat space search
+    and the iterative deepening in the main process and gives every iteration to the workers.
+    The pool and the transposition table of every worker are kept between searches.
+    """
+
+    def __init__(self, workers: int = None, table_size_mb: int = TT_SIZE_MB):
+        """
+        :param workers: number of processes, the number of cpus by default
+        :param table_size_mb: memory budget of the transposition table of each worker
+        """
+        self.workers = workers or os.cpu_count()
+        self._best = multiprocessing.Value("q", -ai.INFINITY)
+        self._cancel = multiprocessing.Event()
+        self._pool = ProcessPoolExecutor(
+            self.workers,
+            initializer=_init_worker,
+            initargs=(self._best, self._cancel, table_size_mb),
+        )
+
+    def search(
+            self,
+            board: ChessBoard,
+            ai_num: int,
+            depth: int = 6,
+            time_limit: float = None,
+            stop: threading.Event = None,
+            use_book: bool = True,
+            use_threats: bool = THREAT_SEARCH,
+            info: dict = None,
+    ) -> Tuple[int, int]:
+        """
+        min_max_search with the positions of the root shared out to the workers, see min_max_search
+        :return: the coordinate of best position, None if the search is cancelled before finding one
+        """
+        return ai.min_max_search(
+            board,
+            ai_num,
+            ai.NullBar(),
+            depth,
+            time_limit=time_limit,
+            stop=stop,
+            use_book=use_book,
+            use_threats=use_threats,
+            info=info,
+            pool=self,
+        )
+
+    def search_root(
+            self,
+            board: ChessBoard,
+            ai_num: int,
+            points: list,
+            depth: int,
+            context: ai.SearchContext,
+            control_bar,
+            guess: int = None,
+    ) -> Tuple[list, dict, int]:
+        """
+        The same as ai.search_root, with every position searched by a worker in the full window
+        and cut by the best score of the others instead of an aspiration window around guess.
+        The workers are stopped by the deadline of the context, and by its stop event which is checked
+        while waiting for them. The nodes of the workers are added to the context.
+        :return: (positions with the best score, {position: score or upper bound of it}, best score)
+        """
+        self._best.value = -ai.INFINITY
+        self._cancel.clear()
+        data = encode_board(board)
+        pending = {
+            self._pool.submit(_search_position, data, ai_num, point, depth, context.deadline)
+            for point in points
+        }
+        scores = {}
+        try:
+            while pending:
+                done, pending = wait(pending, PARALLEL_POLL_INTERVAL, FIRST_COMPLETED)
+                for future in done:
+                    # Raises the SearchTimeout of a worker out of time
+                    point, score, nodes = future.result()
+                    control_bar.step_in()
+                    scores[point] = score
+                    context.nodes += nodes
+                if pending and context.stopped():
+                    raise ai.SearchTimeout
+        finally:
+            if pending:
+                for future in pending:
+                    future.cancel()
+                self._cancel.set()
+                wait(pending)
+        best = max(scores.values(), default=-ai.INFINITY)
+        return [point for point in points if scores[point] == best], scores, best
+
+    def close(self):
+        self._pool.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def benchmark(max_workers: int, depth: int):
+    """
+    Print the speed of the search of a midgame position with 1 to max_workers workers.
+    The opening book and the threat space search are left out, so that only the full search is timed.
+    """
+    board = ChessBoard("c", "c")
+    for x, y in [(7, 7), (7, 8), (8, 8), (6, 6), (8, 7), (9, 9), (6, 8), (5, 9)]:
+        board.set_chess(x, y)
+    base_time = None
+    for workers in range(1, max_workers + 1):
+        with ParallelSearch(workers) as searcher:
+            # Start all the processes before timing
+            list(searcher._pool.map(abs, range(workers)))
+            info = {}
+            start_time = time.time()
+            position = searcher.search(
+                board, board.next_turn, depth, use_book=False, use_threats=False, info=info
+            )
+            used_time = time.time() - start_time
+        if base_time is None:
+            base_time = used_time
+        print(
+            "workers: {:2d}  time: {:7.3f}s  nodes: {:7d}  nodes/s: {:8.0f}  speedup: {:5.2f}  move: {}".format(
+                workers,
+                used_time,
+                info["nodes"],
+                info["nodes"] / used_time,
+                base_time / used_time,
+                position,
+            )
+        )
+
+
+if __name__ == "__main__":
+    benchmark(
+        int(sys.argv[1]) if len(sys.argv) > 1 else os.cpu_count(),
+        int(sys.argv[2]) if len(sys.argv) > 2 else 2,
+    )
@@ -0,0 +1,86 @@
+import threading
+from typing import Tuple, Union
+
+from ai import SIDE_KEYS, TABLE, NullBar, min_max_search, points_gen
+from board import ChessBoard
+from constants import *
+
+
+class Ponderer:
+    """
+    Search the likely replies of the opponent in a background thread while waiting for its move.
+    The searches share the transposition table of ai.py, so even an unfinished one helps the next search.
+    """
+
+    def __init__(self, depth: int = AI_DEPTH, replies: int = PONDER_REPLIES):
+        """
+        :param depth: depth of calculation of each reply
+        :param replies: number of replies to search
+        """
+        self.depth = depth
+        self.replies = replies
+        # (hash of the board after the reply, ai_num) -> best position of the ai
+        self.results = {}
+        self._thread = None
+        self._stop = None
+
+    def start(self, board: ChessBoard, ai_num: int):
+        """
+        Start pondering on a copy of the board
+        :param board: chessboard just after the move of the ai
+        :param ai_num: The player number which ai is
+        """
+        self.stop()
+        self.results = {}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(
+            target=self._ponder,
+            args=(board.copy_board(), ai_num, self._stop),
+            daemon=True,
+        )
+        self._thread.start()
+
+    def stop(self):
+        """
+        Stop pondering and wait for the thread to end
+        """
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+
+    def take(self, board: ChessBoard, ai_num: int) -> Union[Tuple[int, int], None]:
+        """
+        Stop pondering and get the pondered answer of a position
+        :param board: chessboard after the move of the opponent
+        :param ai_num: The player number which ai is
+        :return: the best position if the reply was searched to the end, otherwise None
+        """
+        self.stop()
+        return self.results.get((board.hash, ai_num))
+
+    def predict(self, board: ChessBoard, ai_num: int) -> list:
+        """
+        :return: the likely replies of the opponent, the best one of the last search first
+        """
+        opponent = 1 if ai_num == 2 else 2
+        replies = points_gen(board, opponent)
+        entry = TABLE.probe(board.hash ^ SIDE_KEYS[opponent])
+        if entry is not None and entry[4] in replies:
+            replies.remove(entry[4])
+            replies.insert(0, entry[4])
+        return replies[: self.replies]
+
+    def _ponder(self, board: ChessBoard, ai_num: int, stop: threading.Event):
+        opponent = 1 if ai_num == 2 else 2
+        for x, y in self.predict(board, ai_num):
+            if stop.is_set():
+                return
+            board.make(x, y, opponent)
+            if board.win_determine(x, y) == CONTINUE:
+                position = min_max_search(
+                    board, ai_num, NullBar(), depth=self.depth, stop=stop
+                )
+                if position is not None:
+                    self.results[(board.hash, ai_num)] = position
+            board.unmake()
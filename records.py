@@ -0,0 +1,251 @@
+"""
+Compact binary game records.
+A record file starts with MAGIC, followed by the records one after another. A record is a header
+(number of move bytes, result, flags) and one byte per move: the cell index x * 15 + y.
+Players alternate from the first player given by the flags, PASS gives the turn to the other player without a chess.
+An optional index file (the record file path + INDEX_SUFFIX) holds the offset of every record as uint64.
+"""
+import mmap
+import os
+import struct
+from array import array
+from typing import Iterator, Tuple, Union
+
+from board import ChessBoard
+from constants import *
+
+MAGIC = b"GOBANGGR"
+HEADER = struct.Struct("<HBB")  # number of move bytes, result, flags
+INDEX_SUFFIX = ".idx"
+PASS = 255
+WHITE_FIRST = 1  # flag: the first move is white's
+
+# Result byte of every value of win_determine
+RESULTS = {CONTINUE: 0, BLACK_WIN: 1, WHITE_WIN: 2, TIE: 3}
+RESULT_VALUES = {code: result for result, code in RESULTS.items()}
+
+
+def _scan(data) -> array:
+    """
+    :param data: content of a record file
+    :return: offset of every record, found by hopping from one header to the next
+    """
+    offsets = array("Q")
+    offset = len(MAGIC)
+    while offset < len(data):
+        offsets.append(offset)
+        offset += HEADER.size + HEADER.unpack_from(data, offset)[0]
+    return offsets
+
+
+def _read_index(path: str, data) -> Union[array, None]:
+    """
+    :param path: path of the record file
+    :param data: content of the record file
+    :return: offsets of the index file of the record file, None if there is none or if it does not match the records:
+    the index of a file appended to without index, or cut short, does not end with the last record of the file
+    """
+    if not os.path.exists(path + INDEX_SUFFIX):
+        return None
+    with open(path + INDEX_SUFFIX, "rb") as file:
+        content = file.read()
+    if len(content) % 8:
+        return None
+    offsets = array("Q", content)
+    if not offsets:
+        return offsets if len(data) == len(MAGIC) else None
+    last = offsets[-1]
+    if offsets[0] != len(MAGIC) or last + HEADER.size > len(data):
+        return None
+    if last + HEADER.size + HEADER.unpack_from(data, last)[0] != len(data):
+        return None
+    return offsets
+
+
+def _open_map(path: str) -> mmap.mmap:
+    """
+    :return: the record file mapped for reading, checked to start with MAGIC
+    """
+    with open(path, "rb") as file:
+        # An empty file can not be mapped
+        if file.read(len(MAGIC)) != MAGIC:
+            raise ValueError("{} is not a game record file!".format(path))
+        return mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+class GameWriter:
+    """
+    Append records to a record file one game at a time, without keeping them in memory
+    """
+
+    def __init__(self, path: str, index: bool = True, append: bool = False):
+        """
+        :param path: path of the record file
+        :param index: whether to write the index file too
+        :param append: whether to add the records after those of an existing file
+        """
+        self.path = path
+        exists = append and os.path.exists(path)
+        if exists:
+            data = _open_map(path)
+            try:
+                # The index must cover the records already in the file, otherwise it is made again from them
+                if index and _read_index(path, data) is None:
+                    with open(path + INDEX_SUFFIX, "wb") as file:
+                        file.write(_scan(data).tobytes())
+            finally:
+                data.close()
+            if not index and os.path.exists(path + INDEX_SUFFIX):
+                # It would not list the records written now
+                os.remove(path + INDEX_SUFFIX)
+        self._file = open(path, "ab" if exists else "wb")
+        if not exists:
+            self._file.write(MAGIC)
+        self._index = open(path + INDEX_SUFFIX, "ab" if exists else "wb") if index else None
+        self.count = 0
+
+    def write(self, operations: list, result: int = CONTINUE):
+        """
+        Write one game
+        :param operations: moves as (player, (x, y)), like ChessBoard.operations.
+        A player moving twice in a row is written with a PASS between the moves
+        :param result: BLACK_WIN, WHITE_WIN, TIE or CONTINUE for an unfinished game
+        """
+        data = bytearray()
+        flags = 0
+        if operations:
+            player = operations[0][0]
+            flags = WHITE_FIRST if player == 2 else 0
+            for mover, (x, y) in operations:
+                if mover != player:
+                    data.append(PASS)
+                data.append(x * 15 + y)
+                player = 1 if mover == 2 else 2
+        if self._index is not None:
+            self._index.write(struct.pack("<Q", self._file.tell()))
+        self._file.write(HEADER.pack(len(data), RESULTS[result], flags))
+        self._file.write(data)
+        self.count += 1
+
+    def write_board(self, board: ChessBoard):
+        """
+        Write the game played on a board, with its current result
+        """
+        self.write(board.operations, board.win_determine())
+
+    def flush(self):
+        self._file.flush()
+        if self._index is not None:
+            self._index.flush()
+
+    def close(self):
+        self._file.close()
+        if self._index is not None:
+            self._index.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class GameRecord:
+    """
+    One record of a GameReader. Its moves are copied out of the mapped file as one bytes object,
+    so that the record stays valid after the reader is closed
+    """
+
+    __slots__ = ("moves", "result", "first")
+
+    def __init__(self, moves: bytes, result: int, first: int):
+        """
+        :param moves: move bytes
+        :param result: BLACK_WIN, WHITE_WIN, TIE or CONTINUE
+        :param first: player of the first move
+        """
+        self.moves = moves
+        self.result = result
+        self.first = first
+
+    def __len__(self):
+        return len(self.moves)
+
+    def operations(self) -> list:
+        """
+        :return: the moves as (player, (x, y)), like ChessBoard.operations
+        """
+        operations = []
+        player = self.first
+        for cell in self.moves:
+            if cell != PASS:
+                operations.append((player, divmod(cell, 15)))
+            player = 1 if player == 2 else 2
+        return operations
+
+    def replay(self, board: ChessBoard = None, moves: int = None) -> ChessBoard:
+        """
+        Set the moves on a board through make, so that they can be taken back by unmake.
+        No operation is recorded, next_turn is set to the player to move after them.
+        :param board: board to play on, a new empty one by default
+        :param moves: number of move bytes to replay, all of them by default
+        :return: the board
+        """
+        if board is None:
+            board = ChessBoard("c", "c")
+        player = self.first
+        for cell in self.moves[:moves]:
+            if cell != PASS:
+                board.make(cell // 15, cell % 15, player)
+            player = 1 if player == 2 else 2
+        board.next_turn = player
+        return board
+
+
+class GameReader:
+    """
+    Read a record file through mmap. Records are found by the index file if there is one matching the file,
+    otherwise by hopping from one header to the next.
+    """
+
+    def __init__(self, path: str):
+        """
+        :param path: path of a record file written by GameWriter
+        """
+        self._map = _open_map(path)
+        self._offsets = _read_index(path, self._map)
+
+    def _record(self, offset: int) -> Tuple[GameRecord, int]:
+        length, result, flags = HEADER.unpack_from(self._map, offset)
+        start = offset + HEADER.size
+        record = GameRecord(
+            self._map[start: start + length],
+            RESULT_VALUES[result],
+            2 if flags & WHITE_FIRST else 1,
+        )
+        return record, start + length
+
+    def __len__(self):
+        if self._offsets is None:
+            self._offsets = _scan(self._map)
+        return len(self._offsets)
+
+    def __getitem__(self, number: int) -> GameRecord:
+        if self._offsets is None:
+            self._offsets = _scan(self._map)
+        return self._record(self._offsets[number])[0]
+
+    def __iter__(self) -> Iterator[GameRecord]:
+        offset = len(MAGIC)
+        while offset < len(self._map):
+            record, offset = self._record(offset)
+            yield record
+
+    def close(self):
+        self._map.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
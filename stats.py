@@ -0,0 +1,147 @@
+"""
+Statistics of a search, collected only when a SearchStats is given to min_max_search.
+"""
+import json
+import sys
+import threading
+import time
+from collections import Counter
+
+from constants import *
+
+
+class SamplingProfiler:
+    """
+    Sample the call stack of one thread at a fixed interval from a background thread.
+    Samples are counted as collapsed stacks "file:function;file:function;...", outermost first,
+    the input format of flame graph tools.
+    """
+
+    def __init__(self, interval: float = PROFILE_INTERVAL):
+        """
+        :param interval: seconds between two samples
+        """
+        self.interval = interval
+        self.samples = Counter()
+        self._thread = None
+        self._done = None
+
+    def start(self, thread_id: int = None):
+        """
+        :param thread_id: thread to sample, the calling thread by default
+        """
+        target = threading.get_ident() if thread_id is None else thread_id
+        self._done = threading.Event()
+        self._thread = threading.Thread(
+            target=self._sample, args=(target, self._done), daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is not None:
+            self._done.set()
+            self._thread.join()
+            self._thread = None
+
+    def _sample(self, target: int, done: threading.Event):
+        while not done.wait(self.interval):
+            frame = sys._current_frames().get(target)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append("{}:{}".format(code.co_filename.rsplit("/", 1)[-1], code.co_name))
+                frame = frame.f_back
+            if stack:
+                self.samples[";".join(reversed(stack))] += 1
+
+
+class SearchStats:
+    """
+    Counters of one search. The search only checks whether its stats are None, so that it costs nothing without them.
+    """
+
+    def __init__(self, profile: bool = False):
+        """
+        :param profile: whether to sample the call stack of the search with a SamplingProfiler
+        """
+        self.nodes = 0
+        # remaining depth -> number of nodes searched with it
+        self.nodes_by_depth = Counter()
+        # Nodes whose moves were generated, the moves generated and the moves searched by them
+        self.interior_nodes = 0
+        self.moves_generated = 0
+        self.moves_searched = 0
+        # Beta cutoffs, and those made by the first move searched
+        self.cutoffs = 0
+        self.first_move_cutoffs = 0
+        # Transposition table probes, entries found and searches ended by them
+        self.table_probes = 0
+        self.table_hits = 0
+        self.table_cutoffs = 0
+        # Seconds spent in make / unmake, which update the incremental evaluation, and in points_gen with ordering
+        self.evaluation_time = 0.0
+        self.generation_time = 0.0
+        # Finished iterations of iterative deepening: depth, nodes so far, seconds so far and score
+        self.iterations = []
+        self.seconds = 0.0
+        self.profiler = SamplingProfiler() if profile else None
+        self._start_time = None
+
+    def start(self):
+        """
+        Called by min_max_search when the search starts
+        """
+        self._start_time = time.perf_counter()
+        if self.profiler is not None:
+            self.profiler.start()
+
+    def iteration(self, depth: int, nodes: int, score: int):
+        """
+        Called by min_max_search after every finished iteration
+        """
+        self.iterations.append(
+            {
+                "depth": depth,
+                "nodes": nodes,
+                "seconds": time.perf_counter() - self._start_time,
+                "score": score,
+            }
+        )
+
+    def finish(self, nodes: int):
+        """
+        Called by min_max_search when the search ends
+        """
+        if self.profiler is not None:
+            self.profiler.stop()
+        self.nodes = nodes
+        self.seconds = time.perf_counter() - self._start_time
+
+    def to_dict(self) -> dict:
+        """
+        :return: all the counters, with the rates computed from them
+        """
+        return {
+            "nodes": self.nodes,
+            "seconds": self.seconds,
+            "nodes_per_second": self.nodes / self.seconds if self.seconds else 0,
+            "nodes_by_depth": {str(depth): count for depth, count in sorted(self.nodes_by_depth.items())},
+            "branching_factor": self.moves_generated / self.interior_nodes if self.interior_nodes else 0,
+            "effective_branching_factor": self.moves_searched / self.interior_nodes if self.interior_nodes else 0,
+            "cutoffs": self.cutoffs,
+            "first_move_cutoff_rate": self.first_move_cutoffs / self.cutoffs if self.cutoffs else 0,
+            "table_probes": self.table_probes,
+            "table_hit_rate": self.table_hits / self.table_probes if self.table_probes else 0,
+            "table_cutoffs": self.table_cutoffs,
+            "evaluation_time": self.evaluation_time,
+            "generation_time": self.generation_time,
+            "iterations": self.iterations,
+            "samples": dict(self.profiler.samples.most_common()) if self.profiler is not None else None,
+        }
+
+    def dump(self, path: str):
+        """
+        Append the stats to a file as one JSON line
+        """
+        with open(path, "a") as file:
+            file.write(json.dumps(self.to_dict()) + "\n")
@@ -0,0 +1,67 @@
+"""
+Checks of the opening book of book.py on a small book built for the tests.
+Run with: python -m pytest test_book.py
+"""
+import pytest
+
+from book import OpeningBook, _symmetries, build_book, write_book
+from board import ChessBoard
+
+
+def play(moves: list) -> ChessBoard:
+    board = ChessBoard("c", "c")
+    for x, y in moves:
+        board.set_chess(x, y)
+    return board
+
+
+@pytest.fixture(scope="module")
+def book(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp("book") / "test.book")
+    entries = build_book(2, 2, 1)
+    write_book(path, entries)
+    with OpeningBook(path) as book:
+        assert len(book) == len(entries)
+        yield book
+
+
+def test_lookup_follows_the_book_line(book):
+    moves = []
+    for _ in range(3):
+        position = book.lookup(play(moves))
+        assert position is not None and position not in moves
+        moves.append(position)
+    assert book.lookup(play([])) == (7, 7)
+    assert book.lookup(play([(0, 0)])) is None
+
+
+def test_lookup_is_the_same_in_every_symmetry(book):
+    moves = [(7, 7)]
+    moves.append(book.lookup(play(moves)))
+    for length in (1, 2):
+        best = book.lookup(play(moves[:length]))
+        images = [_symmetries(x, y) for x, y in moves[:length]]
+        boards = [play([image[n] for image in images]) for n in range(8)]
+        best_images = _symmetries(*best)
+        for board in boards:
+            # A symmetric position is the image of itself by several symmetries, any of them gives a best position
+            assert book.lookup(board) in [
+                best_images[n] for n in range(8) if boards[n].hash == board.hash
+            ]
+
+
+def test_lookup_skips_occupied_positions(tmp_path):
+    path = str(tmp_path / "test.book")
+    board = play([(7, 7), (7, 8)])
+    write_book(path, {board.hash: (7, 8)})
+    with OpeningBook(path) as book:
+        assert book.lookup(board) is None
+
+
+@pytest.mark.parametrize("content", [b"", b"GOBANGBK", b"NOTABOOK\x00\x00\x00\x00"])
+def test_not_a_book(tmp_path, content):
+    path = tmp_path / "test.book"
+    path.write_bytes(content)
+    with pytest.raises(ValueError):
+        OpeningBook(str(path))
+    assert OpeningBook.load(str(tmp_path / "missing.book")) is None
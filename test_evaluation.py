@@ -0,0 +1,303 @@
+"""
+Equivalence checks of the fast evaluation, move generation and win detection against plain reference versions,
+on random boards of fixed seeds. Run with: python -m pytest test_evaluation.py
+"""
+import random
+
+import pytest
+
+from board import ChessBoard, fit_pattern_old, use_profile
+from constants import *
+from core_algorithm.algorithms import (
+    evaluate_buffer,
+    evaluate_buffers,
+    evaluate_point,
+    evaluate_point_buffer,
+    PatternTable,
+    score_deltas,
+    score_line,
+)
+
+
+def random_board(rng: random.Random, max_stones: int = 150) -> ChessBoard:
+    """
+    :return: board with chess of random players on random cells, not a real game
+    """
+    board = ChessBoard("c", "c")
+    cells = [(x, y) for x in range(15) for y in range(15)]
+    for x, y in rng.sample(cells, rng.randint(0, max_stones)):
+        board.place(x, y, rng.choice((1, 2)))
+    return board
+
+
+def random_walk(rng: random.Random, steps: int):
+    """
+    Place and remove chess at random on one board
+    :return: generator of the board after every step
+    """
+    board = ChessBoard("c", "c")
+    placed = []
+    for _ in range(steps):
+        if placed and rng.random() < 0.3:
+            x, y = placed.pop(rng.randrange(len(placed)))
+            board.remove(x, y)
+        else:
+            x, y = rng.randrange(15), rng.randrange(15)
+            if board.board[x][y]:
+                continue
+            board.place(x, y, rng.choice((1, 2)))
+            placed.append((x, y))
+        yield board
+
+
+def reference_line_score(line: list, player: int) -> int:
+    return sum(
+        STANDARDS[pattern_type] * fit_pattern_old(line, pattern, player)
+        for pattern_type in PATTERNS
+        for pattern in PATTERNS[pattern_type][player]
+    )
+
+
+def reference_evaluate_point(board: ChessBoard, x: int, y: int, player: int) -> int:
+    """
+    Raise of the score of the four whole lines through (x, y) if the player sets there,
+    the lines read in the orientation of evaluate_point
+    """
+    cells = board.board
+    low = min(x, y)
+    high = min(14 - x, y)
+    lines = [
+        (list(cells[x]), y),
+        ([cells[i][y] for i in range(15)], x),
+        ([cells[x - low + i][y - low + i] for i in range(15 - abs(x - y))], low),
+        ([cells[x + high - i][y - high + i] for i in range(15 - abs(14 - x - y))], high),
+    ]
+    total = 0
+    for line, index in lines:
+        total -= reference_line_score(line, player)
+        line[index] = player
+        total += reference_line_score(line, player)
+    return total
+
+
+def board_lines(board: ChessBoard) -> list:
+    """
+    :return: every row, column and diagonal of board.board as a string of cell values
+    """
+    cells = board.board
+    lines = ["".join(str(cell) for cell in column) for column in cells]
+    lines += ["".join(str(cells[x][y]) for x in range(15)) for y in range(15)]
+    for base in range(-14, 15):
+        lines.append("".join(str(cells[x][x + base]) for x in range(15) if 0 <= x + base < 15))
+        lines.append("".join(str(cells[x][base + 14 - x]) for x in range(15) if 0 <= base + 14 - x < 15))
+    return lines
+
+
+def reference_result(board: ChessBoard) -> int:
+    """
+    win_determine by looking at every cell of the board: a full board is a tie, then black wins before white
+    """
+    if all(all(column) for column in board.board):
+        return TIE
+    lines = board_lines(board)
+    if any("11111" in line for line in lines):
+        return BLACK_WIN
+    if any("22222" in line for line in lines):
+        return WHITE_WIN
+    return CONTINUE
+
+
+def check_score_maps(board: ChessBoard, table: PatternTable = None):
+    """
+    :param table: patterns of the profile in use, the default ones if None
+    """
+    def point_score(x, y, player):
+        if table is None:
+            return evaluate_point(board, (x, y), player)
+        return evaluate_point_buffer(board.buffer, x, y, player, table)
+
+    for player in (1, 2):
+        attack, defence = board.score_maps(player)
+        for x in range(15):
+            for y in range(15):
+                index = x * 15 + y
+                if board.board[x][y]:
+                    assert attack[index] == 0 and defence[index] == 0
+                else:
+                    assert attack[index] == point_score(x, y, player)
+                    assert defence[index] == point_score(x, y, 1 if player == 2 else 2)
+
+
+def test_score_maps_follow_place_and_remove():
+    rng = random.Random(20)
+    for _ in range(30):
+        board = None
+        for board in random_walk(rng, rng.randint(0, 60)):
+            if rng.random() < 0.2:
+                check_score_maps(board)
+        if board is not None:
+            check_score_maps(board)
+            check_score_maps(board.copy_board())
+
+
+def test_score_maps_follow_make_and_unmake():
+    rng = random.Random(22)
+    board = random_board(rng, 40)
+    check_score_maps(board)
+    for _ in range(20):
+        moves = []
+        for _ in range(rng.randint(1, 6)):
+            x, y = divmod(rng.choice(sorted(board.frontier)), 15)
+            board.make(x, y, rng.choice((1, 2)))
+            moves.append((x, y))
+            check_score_maps(board)
+        for _ in moves:
+            board.unmake()
+        check_score_maps(board)
+
+
+def test_score_maps_follow_profiles():
+    rng = random.Random(23)
+    board = random_board(rng, 60)
+    try:
+        for name in ("alternative", "default"):
+            use_profile(name)
+            board.rescore()
+            check_score_maps(board, PatternTable(PATTERNS, PROFILES[name]))
+            for player in (1, 2):
+                assert board.scores[player] == ChessBoard.evaluate(player, list(board.split_board()))
+    finally:
+        use_profile("default")
+
+
+def test_incremental_scores_equal_evaluate():
+    rng = random.Random(24)
+    for board in random_walk(rng, 200):
+        for player in (1, 2):
+            assert board.scores[player] == ChessBoard.evaluate(player, list(board.split_board()))
+
+
+def test_score_line_equals_fit_pattern():
+    rng = random.Random(4)
+    for _ in range(30):
+        board = random_board(rng)
+        for line in board.split_board():
+            for player in (1, 2):
+                assert score_line(line, player) == reference_line_score(line, player)
+
+
+def test_evaluate_point_scans_whole_lines():
+    rng = random.Random(40)
+    for _ in range(4):
+        board = random_board(rng)
+        for x in range(15):
+            for y in range(15):
+                if not board.board[x][y]:
+                    for player in (1, 2):
+                        assert evaluate_point(board, (x, y), player) == reference_evaluate_point(board, x, y, player)
+
+
+def test_evaluate_point_near_edge():
+    # The second diagonal through a point of the x = 0 edge was cut short before
+    board = ChessBoard("c", "c")
+    for x, y in ((1, 5), (2, 4), (3, 3)):
+        board.place(x, y, 1)
+    for player in (1, 2):
+        assert evaluate_point(board, (0, 6), player) == reference_evaluate_point(board, 0, 6, player)
+
+
+@pytest.mark.parametrize("sequence, player", [([1] * 40, 1), ([1, 0], 3), ([1, 0], 0), ([5, 0, 0], 1)])
+def test_score_line_rejects_bad_input(sequence, player):
+    with pytest.raises(ValueError):
+        score_line(sequence, player)
+
+
+def test_score_deltas_equal_score_line():
+    rng = random.Random(6)
+    for _ in range(30):
+        for line in random_board(rng).split_board():
+            for player in (1, 2):
+                base = score_line(line, player)
+                for index, delta in enumerate(score_deltas(line, player)):
+                    if line[index]:
+                        assert delta == 0
+                    else:
+                        assert delta == score_line(line[:index] + [player] + line[index + 1:], player) - base
+
+
+@pytest.mark.parametrize("sequence, player", [([0] * 16, 2), ([0, 1], 3), ([0, -1], 1)])
+def test_score_deltas_rejects_bad_input(sequence, player):
+    with pytest.raises(ValueError):
+        score_deltas(sequence, player)
+
+
+def test_batch_equals_evaluate():
+    pytest.importorskip("numpy")
+    from batch import boards_to_array, evaluate_batch
+
+    rng = random.Random(5)
+    boards = [random_board(rng, 225) for _ in range(300)]
+    result = evaluate_batch(boards_to_array(boards), chunk_size=64)
+    for board, scores in zip(boards, result.tolist()):
+        assert scores == [ChessBoard.evaluate(player, list(board.split_board())) for player in (1, 2)]
+
+
+@pytest.mark.parametrize("value", [-1, 3, 7])
+def test_batch_rejects_bad_cells(value):
+    np = pytest.importorskip("numpy")
+    from batch import evaluate_batch
+
+    boards = np.zeros((2, 15, 15), dtype=np.int8)
+    boards[1, 7, 3:7] = 1
+    boards[1, 7, 7] = value
+    with pytest.raises(ValueError):
+        evaluate_batch(boards)
+
+
+def test_buffer_functions_equal_evaluate():
+    rng = random.Random(18)
+    boards = [random_board(rng, 225) for _ in range(40)]
+    for player in (1, 2):
+        expected = [ChessBoard.evaluate(player, list(board.split_board())) for board in boards]
+        assert [evaluate_buffer(board.buffer, player) for board in boards] == expected
+        for board in boards[:5]:
+            for x in range(15):
+                for y in range(15):
+                    if not board.board[x][y]:
+                        assert evaluate_point_buffer(board.buffer, x, y, player) == evaluate_point(
+                            board, (x, y), player
+                        )
+    np = pytest.importorskip("numpy")
+    data = np.array([np.asarray(board.buffer) for board in boards], dtype=np.int8)
+    out = np.zeros(len(boards), dtype=np.int64)
+    evaluate_buffers(data, 1, out)
+    assert out.tolist() == [ChessBoard.evaluate(1, list(board.split_board())) for board in boards]
+
+
+def test_buffer_functions_reject_bad_input():
+    cells = memoryview(bytearray([100]) * 225).cast("b", (15, 15))
+    with pytest.raises(ValueError):
+        evaluate_buffer(cells, 1)
+    with pytest.raises(ValueError):
+        evaluate_buffer(ChessBoard("c", "c").buffer, 0)
+    with pytest.raises(ValueError):
+        evaluate_point_buffer(cells, 7, 7, 1)
+
+
+def test_win_determine_equals_full_scan():
+    rng = random.Random(21)
+    for _ in range(60):
+        for board in random_walk(rng, rng.randint(0, 260)):
+            placed = sum(cell != 0 for column in board.board for cell in column)
+            assert board.win_determine() == reference_result(board)
+            assert board.stones == placed
+            assert board.is_empty() == (not placed)
+
+
+def test_win_determine_full_board():
+    rng = random.Random(25)
+    board = ChessBoard("c", "c")
+    for x in range(15):
+        for y in range(15):
+            board.place(x, y, rng.choice((1, 2)))
+    assert board.win_determine() == reference_result(board) == TIE
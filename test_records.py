@@ -0,0 +1,103 @@
+"""
+Round trips of games through the binary record format of records.py
+"""
+import os
+import random
+
+import pytest
+
+from board import ChessBoard
+from constants import *
+from records import INDEX_SUFFIX, GameReader, GameWriter
+
+
+def random_games(rng: random.Random, count: int) -> list:
+    """
+    :return: boards of games played at random until they end or stop
+    """
+    boards = []
+    for _ in range(count):
+        board = ChessBoard("c", "c")
+        for cell in rng.sample(range(225), rng.randint(0, 120)):
+            if board.set_chess(cell // 15, cell % 15) != CONTINUE:
+                break
+        boards.append(board)
+    return boards
+
+
+def write_games(path: str, boards: list, index: bool = True, append: bool = False):
+    with GameWriter(path, index=index, append=append) as writer:
+        for board in boards:
+            writer.write_board(board)
+
+
+def check_records(path: str, boards: list):
+    with GameReader(path) as reader:
+        assert len(reader) == len(boards)
+        records = list(reader)
+        assert reader[len(boards) - 1].operations() == boards[-1].operations
+    # Records stay valid after the reader is closed
+    assert len(records) == len(boards)
+    for board, record in zip(boards, records):
+        assert record.operations() == board.operations
+        assert record.result == board.win_determine()
+        replayed = record.replay()
+        assert replayed.board == board.board
+        assert replayed.hash == board.hash
+        assert replayed.next_turn == board.next_turn
+
+
+@pytest.mark.parametrize("index", [True, False])
+def test_round_trip(tmp_path, index):
+    path = str(tmp_path / "games.gbr")
+    boards = random_games(random.Random(23), 200)
+    write_games(path, boards, index)
+    assert os.path.exists(path + INDEX_SUFFIX) == index
+    check_records(path, boards)
+
+
+def test_round_trip_white_first_and_repeated_player(tmp_path):
+    path = str(tmp_path / "games.gbr")
+    operations = [(2, (7, 7)), (2, (7, 8)), (1, (0, 0)), (1, (14, 14))]
+    with GameWriter(path) as writer:
+        writer.write(operations, TIE)
+        writer.write([], CONTINUE)
+    with GameReader(path) as reader:
+        record, empty = list(reader)
+    assert record.operations() == operations and record.first == 2 and record.result == TIE
+    assert empty.operations() == [] and empty.result == CONTINUE
+    board = record.replay(moves=1)
+    assert board.board[7][7] == 2 and board.next_turn == 1 and board.stones == 1
+
+
+@pytest.mark.parametrize("first_index, second_index", [(True, False), (False, True), (True, True)])
+def test_append_keeps_the_index_right(tmp_path, first_index, second_index):
+    path = str(tmp_path / "games.gbr")
+    boards = random_games(random.Random(24), 10)
+    write_games(path, boards[:6], first_index)
+    write_games(path, boards[6:], second_index, append=True)
+    assert os.path.exists(path + INDEX_SUFFIX) == second_index
+    check_records(path, boards)
+
+
+def test_stale_index_is_not_trusted(tmp_path):
+    path = str(tmp_path / "games.gbr")
+    boards = random_games(random.Random(25), 8)
+    write_games(path, boards[:5])
+    with open(path + INDEX_SUFFIX, "rb") as file:
+        stale = file.read()
+    write_games(path, boards[5:], append=True)
+    with open(path + INDEX_SUFFIX, "wb") as file:
+        file.write(stale)
+    check_records(path, boards)
+
+
+@pytest.mark.parametrize("content", [b"", b"NOTGAMES", b"GOBANG"])
+def test_not_a_record_file(tmp_path, content):
+    path = str(tmp_path / "games.gbr")
+    with open(path, "wb") as file:
+        file.write(content)
+    with pytest.raises(ValueError):
+        GameReader(path)
+    with pytest.raises(ValueError):
+        GameWriter(path, append=True)
@@ -0,0 +1,80 @@
+"""
+Checks of the principal variation search of ai.py against a plain negamax without transposition table,
+move ordering or pruning, on the positions of the benchmark corpus. Run with: python -m pytest test_search.py
+"""
+import pytest
+
+import ai
+from benchmark import corpus_boards
+from board import ChessBoard
+from constants import *
+from ordering import MoveOrdering
+from transposition import TranspositionTable
+
+POSITIONS = corpus_boards()
+POSITION_IDS = ["{}-{}".format(category, index) for category, index, _ in POSITIONS]
+
+
+def negamax(board: ChessBoard, player: int, depth: int) -> int:
+    """
+    :return: the score of the position for the player to move, searched with every move of points_gen
+    """
+    opponent = 1 if player == 2 else 2
+    if depth <= 0 or board.win_determine() != CONTINUE:
+        return board.scores[player] - board.scores[opponent]
+    best = -ai.INFINITY
+    for x, y in ai.points_gen(board, player):
+        board.make(x, y, player)
+        try:
+            best = max(best, -negamax(board, opponent, depth - 1))
+        finally:
+            board.unmake()
+    return best
+
+
+def negamax_root(board: ChessBoard, player: int, depth: int):
+    """
+    :return: (positions with the best score, best score) of the root, as search_root
+    """
+    opponent = 1 if player == 2 else 2
+    scores = {}
+    for x, y in ai.points_gen(board, player):
+        board.make(x, y, player)
+        try:
+            scores[(x, y)] = -negamax(board, opponent, depth)
+        finally:
+            board.unmake()
+    best = max(scores.values())
+    return sorted(point for point in scores if scores[point] == best), best
+
+
+@pytest.mark.parametrize("category, index, board", POSITIONS, ids=POSITION_IDS)
+def test_search_root_equals_negamax(category, index, board):
+    player = board.next_turn
+    points = ai.points_gen(board, player)
+    context = ai.SearchContext(TranspositionTable(4), ordering=MoveOrdering())
+    guess = None
+    for depth in range(3):
+        candidates, _, score = ai.search_root(board, player, points, depth, context, ai.NullBar(), guess)
+        assert (sorted(candidates), score) == negamax_root(board, player, depth)
+        guess = score
+
+
+@pytest.mark.parametrize("category, index, board", POSITIONS, ids=POSITION_IDS)
+def test_min_max_search_scores_like_negamax(category, index, board):
+    player = board.next_turn
+    info = {}
+    position = ai.min_max_search(
+        board,
+        player,
+        ai.NullBar(),
+        2,
+        table=TranspositionTable(4),
+        ordering=MoveOrdering(),
+        use_book=False,
+        use_threats=False,
+        info=info,
+    )
+    candidates, score = negamax_root(board, player, 2)
+    assert position in candidates
+    assert info["depth"] == 2 and info["score"] == score
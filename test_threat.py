@@ -0,0 +1,76 @@
+"""
+Checks of the threat space search of threat.py on the positions of the benchmark corpus.
+Run with: python -m pytest test_threat.py
+"""
+import threading
+import time
+
+import pytest
+
+from benchmark import corpus_boards
+from board import ChessBoard
+from constants import *
+from threat import ThreatSolver, threat_cells
+
+POSITIONS = {(category, index): board for category, index, board in corpus_boards()}
+WINS = [("tactical", 0), ("tactical", 1)]
+NO_WINS = [key for key in POSITIONS if key not in WINS]
+
+
+def check_sequence(board: ChessBoard, attacker: int, sequence: list):
+    """
+    Play the sequence on a copy of the board, alternately from the attacker, and check that it wins:
+    it ends with a five, or with a move which makes two fives at once
+    """
+    board = board.copy_board()
+    defender = 1 if attacker == 2 else 2
+    for number, (x, y) in enumerate(sequence):
+        assert board.board[x][y] == 0
+        board.place(x, y, attacker if number % 2 == 0 else defender)
+        if number % 2 == 0 and number < len(sequence) - 1:
+            assert board.win_determine() == CONTINUE
+    won = BLACK_WIN if attacker == 1 else WHITE_WIN
+    assert board.win_determine() == won or len(threat_cells(board, attacker, 0)) >= 2
+
+
+@pytest.mark.parametrize("key", WINS)
+def test_solve_finds_the_wins(key):
+    board = POSITIONS[key]
+    sequence = ThreatSolver().solve(board, board.next_turn)
+    assert sequence is not None
+    check_sequence(board, board.next_turn, sequence)
+
+
+@pytest.mark.parametrize("key", NO_WINS)
+def test_solve_finds_no_win(key):
+    board = POSITIONS[key]
+    assert ThreatSolver().solve(board, board.next_turn) is None
+
+
+def test_vcf_blocks_are_forced():
+    # White to move wins by fours alone: each four leaves black one cell to block
+    board = ChessBoard("c", "c")
+    for x, y in [(5, 10), (7, 6), (10, 9), (7, 7), (6, 7), (4, 9), (10, 10), (5, 5), (8, 4), (7, 10), (4, 7),
+                 (5, 7), (8, 10), (6, 5), (4, 4)]:
+        board.set_chess(x, y)
+    sequence = ThreatSolver().vcf(board, 2)
+    assert sequence is not None and len(sequence) >= 5
+    check_sequence(board, 2, sequence)
+    for number in range(1, len(sequence), 2):
+        image = board.copy_board()
+        for move, (x, y) in enumerate(sequence[:number]):
+            image.place(x, y, 2 if move % 2 == 0 else 1)
+        assert threat_cells(image, 2, 0) == {sequence[number]}
+
+
+def test_cut_searches_are_not_cached():
+    board = POSITIONS[WINS[0]]
+    solver = ThreatSolver()
+    stop = threading.Event()
+    stop.set()
+    assert solver.solve(board, board.next_turn, stop=stop) is None
+    assert solver.cut
+    assert solver.solve(board, board.next_turn, deadline=time.time() - 1) is None
+    assert None not in solver.cache.values()
+    assert solver.solve(board, board.next_turn) is not None
+    assert not solver.cut
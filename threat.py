@@ -0,0 +1,332 @@
+"""
+Threat space search: find forced wins made only of threats.
+VCF (victory by continuous fours) only plays fours, which leave the opponent a single cell to block.
+VCT (victory by continuous threats) also plays live threes, which the opponent must block on the line
+or answer with its own fours.
+"""
+import threading
+import time
+from typing import Union
+
+from board import CELL_LINES, LINE_LENGTHS, LINES, ChessBoard, has_five
+from constants import *
+
+# Threats of line contents, shared by all boards.
+# Key: length | mine << 4 | theirs << 19, value: result of line_fours / line_threes
+_LINE_FOURS = {}
+_LINE_THREES = {}
+
+
+def five_cells(length: int, mine: int, theirs: int) -> int:
+    """
+    :param length: number of cells in the line
+    :param mine: bitmask of the player's chess in the line
+    :param theirs: bitmask of the opponent's chess in the line
+    :return: bitmask of the empty cells where a chess of the player makes five
+    """
+    cells = 0
+    for start in range(length - 4):
+        window = 31 << start
+        if not theirs & window and bin(mine & window).count("1") == 4:
+            cells |= window & ~mine
+    return cells
+
+
+def line_fours(length: int, mine: int, theirs: int) -> tuple:
+    """
+    Find the moves of a player making five or four in one line
+    :param length: number of cells in the line
+    :param mine: bitmask of the player's chess in the line
+    :param theirs: bitmask of the opponent's chess in the line
+    :return: (fives, fours, live fours), positions in the line where a chess of the player makes
+    a five / a four (at least one cell left to make five) / a live four (at least two such cells)
+    """
+    key = length | mine << 4 | theirs << 19
+    threats = _LINE_FOURS.get(key)
+    if threats is None:
+        empty = ((1 << length) - 1) & ~(mine | theirs)
+        fives, fours, live_fours = [], [], []
+        for pos in range(length):
+            if not empty >> pos & 1:
+                continue
+            after = mine | 1 << pos
+            if has_five(after):
+                fives.append(pos)
+                continue
+            cells = five_cells(length, after, theirs)
+            if cells:
+                fours.append(pos)
+                if cells & (cells - 1):
+                    live_fours.append(pos)
+        threats = (tuple(fives), tuple(fours), tuple(live_fours))
+        if len(_LINE_FOURS) >= LINE_CACHE_SIZE:
+            _LINE_FOURS.clear()
+        _LINE_FOURS[key] = threats
+    return threats
+
+
+def line_threes(length: int, mine: int, theirs: int) -> tuple:
+    """
+    Find the moves of a player making a live three in one line
+    :return: positions in the line where a chess of the player makes no four,
+    but leaves a cell nearby which makes a live four
+    """
+    key = length | mine << 4 | theirs << 19
+    threes = _LINE_THREES.get(key)
+    if threes is None:
+        empty = ((1 << length) - 1) & ~(mine | theirs)
+        threes = []
+        for pos in range(length):
+            if not empty >> pos & 1:
+                continue
+            after = mine | 1 << pos
+            if has_five(after) or five_cells(length, after, theirs):
+                continue
+            for other in range(max(pos - 4, 0), min(pos + 5, length)):
+                if other != pos and empty >> other & 1:
+                    cells = five_cells(length, after | 1 << other, theirs)
+                    if cells & (cells - 1):
+                        threes.append(pos)
+                        break
+        threes = tuple(threes)
+        if len(_LINE_THREES) >= LINE_CACHE_SIZE:
+            _LINE_THREES.clear()
+        _LINE_THREES[key] = threes
+    return threes
+
+
+def threat_cells(board: ChessBoard, player: int, kind: int) -> set:
+    """
+    Find the threat moves of a player on the whole board
+    :param board: chessboard
+    :param player: 1 for black and 2 for white
+    :param kind: 0 for fives, 1 for fours, 2 for live fours as in line_fours, and 3 for live threes
+    :return: set of (x, y)
+    """
+    mine, theirs = board.masks[player], board.masks[1 if player == 2 else 2]
+    cells = set()
+    for line in range(len(LINES)):
+        if mine[line]:
+            if kind == 3:
+                positions = line_threes(LINE_LENGTHS[line], mine[line], theirs[line])
+            else:
+                positions = line_fours(LINE_LENGTHS[line], mine[line], theirs[line])[kind]
+            for pos in positions:
+                cells.add(LINES[line][pos])
+    return cells
+
+
+class ThreatSolver:
+    """
+    VCF and VCT search with a node limit and a cache of solved positions, kept between searches
+    """
+
+    def __init__(self, max_nodes: int = THREAT_NODES):
+        """
+        :param max_nodes: max number of moves tried by one call of vcf or vct
+        """
+        self.max_nodes = max_nodes
+        # (hash, attacker, depth, is vct) -> winning sequence or None
+        self.cache = {}
+        self.nodes = 0
+        # Limits of the current call: time.time() to stop at, event to cancel it, and whether one of the limits
+        # (or max_nodes) cut the search, so that its failures are not proven
+        self.deadline = None
+        self.stop = None
+        self.cut = False
+
+    def solve(
+            self, board: ChessBoard, attacker: int, deadline: float = None, stop: threading.Event = None
+    ) -> Union[list, None]:
+        """
+        Find a forced win by VCF first, then by VCT.
+        VCT is not tried if the opponent has a VCF, which could answer the threes.
+        :param deadline: time.time() to give up at, None for no limit but max_nodes
+        :param stop: event to cancel the search from another thread
+        :return: the winning sequence, starting with the move of the attacker, or None
+        """
+        sequence = self.vcf(board, attacker, deadline=deadline, stop=stop)
+        if sequence is None and self.vcf(board, 1 if attacker == 2 else 2, deadline=deadline, stop=stop) is None:
+            sequence = self.vct(board, attacker, deadline=deadline, stop=stop)
+        return sequence
+
+    def vcf(
+            self,
+            board: ChessBoard,
+            attacker: int,
+            depth: int = VCF_DEPTH,
+            deadline: float = None,
+            stop: threading.Event = None,
+    ) -> Union[list, None]:
+        """
+        Victory by continuous fours
+        :param board: chessboard, the attacker to move
+        :param attacker: 1 for black and 2 for white
+        :param depth: max number of fours of the attacker
+        :param deadline: time.time() to give up at, None for no limit but max_nodes
+        :param stop: event to cancel the search from another thread
+        :return: the moves of both players until the win, starting with the move of the attacker, or None
+        """
+        self._start(deadline, stop)
+        return self._vcf(board, attacker, depth)
+
+    def vct(
+            self,
+            board: ChessBoard,
+            attacker: int,
+            depth: int = VCT_DEPTH,
+            deadline: float = None,
+            stop: threading.Event = None,
+    ) -> Union[list, None]:
+        """
+        Victory by continuous threes and fours
+        :param board: chessboard, the attacker to move
+        :param attacker: 1 for black and 2 for white
+        :param depth: max number of threats of the attacker
+        :param deadline: time.time() to give up at, None for no limit but max_nodes
+        :param stop: event to cancel the search from another thread
+        :return: the moves of both players until the win along the first defence tried,
+        starting with the move of the attacker, or None
+        """
+        self._start(deadline, stop)
+        return self._vct(board, attacker, depth)
+
+    def _start(self, deadline: Union[float, None], stop: Union[threading.Event, None]):
+        self.nodes = 0
+        self.deadline = deadline
+        self.stop = stop
+        self.cut = False
+
+    def _exhausted(self) -> bool:
+        """
+        :return: whether the node limit, the deadline or the stop event ends the search
+        """
+        if not self.cut:
+            self.cut = (
+                self.nodes >= self.max_nodes
+                or (self.deadline is not None and time.time() >= self.deadline)
+                or (self.stop is not None and self.stop.is_set())
+            )
+        return self.cut
+
+    def _lookup(self, key: tuple):
+        return self.cache.get(key, False)
+
+    def _save(self, key: tuple, result: Union[list, None]):
+        # Results cut by the limits are not proven, so they are not saved
+        if result is None and self.cut:
+            return
+        if len(self.cache) >= LINE_CACHE_SIZE:
+            self.cache.clear()
+        self.cache[key] = result
+
+    def _attack(self, board: ChessBoard, attacker: int, vct: bool, depth: int):
+        """
+        Common start of vcf and vct
+        :return: (result, moves): the result if it is already known, otherwise the moves to try
+        """
+        defender = 1 if attacker == 2 else 2
+        fives = threat_cells(board, attacker, 0)
+        if fives:
+            return [min(fives)], None
+        if depth <= 0 or self._exhausted():
+            return None, None
+        fours = threat_cells(board, attacker, 1)
+        defender_fives = threat_cells(board, defender, 0)
+        if defender_fives:
+            # The only move is to block, which must be a four to keep the initiative
+            if len(defender_fives) > 1:
+                return None, None
+            return False, sorted(defender_fives & fours)
+        live_fours = threat_cells(board, attacker, 2)
+        moves = sorted(live_fours) + sorted(fours - live_fours)
+        if vct:
+            moves += sorted(threat_cells(board, attacker, 3) - fours)
+        return False, moves
+
+    def _vcf(self, board: ChessBoard, attacker: int, depth: int) -> Union[list, None]:
+        key = (board.hash, attacker, depth, False)
+        result = self._lookup(key)
+        if result is not False:
+            return result
+        result, moves = self._attack(board, attacker, False, depth)
+        if result is not False:
+            return result
+
+        result = None
+        defender = 1 if attacker == 2 else 2
+        for x, y in moves:
+            self.nodes += 1
+            board.make(x, y, attacker)
+            wins = threat_cells(board, attacker, 0)
+            if len(wins) >= 2:
+                result = [(x, y)]
+            else:
+                block = wins.pop()
+                board.make(block[0], block[1], defender)
+                sequence = self._vcf(board, attacker, depth - 1)
+                board.unmake()
+                if sequence is not None:
+                    result = [(x, y), block] + sequence
+            board.unmake()
+            if result is not None:
+                break
+        self._save(key, result)
+        return result
+
+    def _vct(self, board: ChessBoard, attacker: int, depth: int) -> Union[list, None]:
+        key = (board.hash, attacker, depth, True)
+        result = self._lookup(key)
+        if result is not False:
+            return result
+        result, moves = self._attack(board, attacker, True, depth)
+        if result is not False:
+            return result
+
+        result = None
+        defender = 1 if attacker == 2 else 2
+        for x, y in moves:
+            self.nodes += 1
+            board.make(x, y, attacker)
+            wins = threat_cells(board, attacker, 0)
+            if len(wins) >= 2:
+                result = [(x, y)]
+            else:
+                line = None
+                for defence in sorted(self._defences(board, attacker, x, y, wins)):
+                    board.make(defence[0], defence[1], defender)
+                    sequence = self._vct(board, attacker, depth - 1)
+                    board.unmake()
+                    if sequence is None:
+                        line = None
+                        break
+                    if line is None:
+                        line = [(x, y), defence] + sequence
+                result = line
+            board.unmake()
+            if result is not None:
+                break
+        self._save(key, result)
+        return result
+
+    @staticmethod
+    def _defences(board: ChessBoard, attacker: int, x: int, y: int, wins: set) -> set:
+        """
+        Find every move which may stop the threat just made at (x, y)
+        :param wins: cells where the attacker can make five now
+        :return: set of (x, y), a superset of the real defences
+        """
+        if wins:
+            # A four: the only defence is to block it
+            return wins
+        defender = 1 if attacker == 2 else 2
+        # A live three: block near a cell which makes a live four, or counter with a four
+        defences = threat_cells(board, defender, 1)
+        mine, theirs = board.masks[attacker], board.masks[defender]
+        for line, _ in CELL_LINES[x][y]:
+            length = LINE_LENGTHS[line]
+            for pos in line_fours(length, mine[line], theirs[line])[2]:
+                for other in range(max(pos - 4, 0), min(pos + 5, length)):
+                    if not (mine[line] | theirs[line]) & 1 << other:
+                        defences.add(LINES[line][other])
+        return defences
@@ -0,0 +1,82 @@
+from typing import Tuple, Union
+
+from constants import *
+
+# Bound type of a stored score
+EXACT = 0
+LOWER = 1  # the real score is at least the stored one (beta cut)
+UPPER = 2  # the real score is at most the stored one (no move raised alpha)
+
+# Approximate memory used by one entry: the list slot, the entry tuple and the integers in it
+ENTRY_SIZE = 160
+
+
+class TranspositionTable:
+    """
+    Fixed size hash table of searched positions, indexed by Zobrist key.
+    Each entry is a tuple (key, depth, bound, score, best move, generation).
+    """
+
+    def __init__(self, size_mb: int = TT_SIZE_MB):
+        """
+        :param size_mb: memory budget of the table in megabytes, rounded down to a power of two entries
+        """
+        capacity = 1
+        while capacity * 2 * ENTRY_SIZE <= size_mb * 1024 * 1024:
+            capacity *= 2
+        self.mask = capacity - 1
+        self.entries = [None] * capacity
+        # Increased for every new root search, so that entries of old searches can be replaced first
+        self.generation = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def new_search(self):
+        """
+        Mark entries stored before as old ones
+        """
+        self.generation += 1
+
+    def clear(self):
+        self.entries = [None] * len(self.entries)
+        self.generation = 0
+
+    def probe(self, key: int) -> Union[tuple, None]:
+        """
+        Find the entry of a position
+        :param key: Zobrist key of the position
+        :return: (key, depth, bound, score, best move, generation), or None if the position is not stored
+        """
+        entry = self.entries[key & self.mask]
+        if entry is not None and entry[0] == key:
+            return entry
+        return None
+
+    def store(
+            self,
+            key: int,
+            depth: int,
+            bound: int,
+            score: int,
+            move: Union[Tuple[int, int], None],
+    ):
+        """
+        Store the result of a search.
+        Replacement policy: an entry is kept only if it belongs to another position of the current search
+        and was searched deeper than the new one.
+        :param key: Zobrist key of the position
+        :param depth: remaining depth of the search
+        :param bound: EXACT, LOWER or UPPER
+        :param score: score of the search
+        :param move: best move found, or None
+        """
+        index = key & self.mask
+        old = self.entries[index]
+        if (
+                old is None
+                or old[0] == key
+                or old[5] != self.generation
+                or depth >= old[1]
+        ):
+            self.entries[index] = (key, depth, bound, score, move, self.generation)